@@ -0,0 +1,401 @@
+"""Benchmarks for the workout generator.
+
+The solver comparison runs against the configured database (DATABASE_URL);
+the scaling suite builds synthetic SQLite catalogs in a temporary directory
+and appends its results to a JSON lines file so runs can be compared:
+
+    python -m app.benchmark solvers --runs 50
+    python -m app.benchmark scale --sizes 1000 10000 100000 --runs 200
+    python -m app.benchmark concurrency --clients 10 100 200
+
+The concurrency benchmark also runs against the configured database (seed it first).
+"""
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.util import await_only
+from app import models
+from app.database import SessionLocal, count_statements, engine, get_async_engine, get_db
+from app.catalog import ExerciseCatalog, get_catalog
+from app.fragments import json_array
+from app.models import MovementType, MuscleGroupType
+from app.workout_generator import WorkoutGenerator, SOLVERS
+import argparse
+import asyncio
+import datetime
+import httpx
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+DURATIONS = [10, 15, 20, 30, 45, 60]
+PRESETS = {
+    "any": {},
+    "kettlebell": {"allowed_equipment": ["kettlebell"]},
+    "dumbbell/low": {"allowed_equipment": ["dumbbell"], "intensity_level": 2},
+    "upper body": {"allowed_muscle_groups": ["chest", "front_deltoids", "side_deltoids", "rear_deltoids",
+                                             "biceps", "triceps", "forearms", "upper_back", "lats", "abs", "obliques"]},
+}
+
+# Shape of the synthetic catalogs, loosely following the seed exercises: the
+# share of exercises per primary movement type, the muscle groups each movement
+# type typically works (most common first) and how often equipment is needed
+MOVEMENT_TYPE_WEIGHTS = {
+    MovementType.PUSH: 0.22,
+    MovementType.PULL: 0.20,
+    MovementType.SQUAT: 0.20,
+    MovementType.HINGE: 0.15,
+    MovementType.CORE: 0.15,
+    MovementType.TWIST: 0.08,
+}
+MOVEMENT_TYPE_MUSCLE_GROUPS = {
+    MovementType.PUSH: [MuscleGroupType.CHEST, MuscleGroupType.TRICEPS, MuscleGroupType.FRONT_DELTOIDS,
+                        MuscleGroupType.SIDE_DELTOIDS, MuscleGroupType.ABS],
+    MovementType.PULL: [MuscleGroupType.LATS, MuscleGroupType.UPPER_BACK, MuscleGroupType.BICEPS,
+                        MuscleGroupType.REAR_DELTOIDS, MuscleGroupType.FOREARMS],
+    MovementType.SQUAT: [MuscleGroupType.QUADS, MuscleGroupType.GLUTES, MuscleGroupType.ADDUCTORS,
+                         MuscleGroupType.CALVES, MuscleGroupType.ABS],
+    MovementType.HINGE: [MuscleGroupType.HAMSTRINGS, MuscleGroupType.GLUTES, MuscleGroupType.LOWER_BACK,
+                         MuscleGroupType.UPPER_BACK, MuscleGroupType.ABDUCTORS],
+    MovementType.CORE: [MuscleGroupType.ABS, MuscleGroupType.OBLIQUES, MuscleGroupType.LOWER_BACK],
+    MovementType.TWIST: [MuscleGroupType.OBLIQUES, MuscleGroupType.ABS, MuscleGroupType.FRONT_DELTOIDS],
+}
+EQUIPMENT_WEIGHTS = {None: 0.35, "kettlebell": 0.25, "dumbbell": 0.25, "resistance band": 0.1, "stall bars": 0.05}
+DURATION_WEIGHTS = {30: 0.4, 45: 0.35, 60: 0.25}
+INTENSITY_WEIGHTS = {"low": 0.2, "medium": 0.6, "high": 0.2}
+SCALE_SIZES = [1000, 10000, 100000]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def bench_solvers(runs: int):
+    """Compare duration hit rate and latency of every solver over a grid of durations and filter presets.
+
+    A run is a hit when the generated workout is within 30 seconds of the target,
+    i.e. it rounds to the requested number of minutes.
+    """
+    db = SessionLocal()
+    try:
+        generator = WorkoutGenerator(db, catalog=get_catalog(db))
+    finally:
+        db.close()
+
+    print(f"{'solver':<8} {'hit rate':>9} {'mean |err| s':>13} {'failures':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for solver in SOLVERS:
+        latencies, errors, failures = [], [], 0
+        for kwargs in PRESETS.values():
+            for duration_minutes in DURATIONS:
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    try:
+                        workout = generator.generate_workout(duration_minutes, solver=solver, **kwargs)
+                    except ValueError:
+                        failures += 1
+                        continue
+                    finally:
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    total_seconds = generator.calculate_workout_duration(workout["exercises"], workout["rounds"])
+                    errors.append(abs(total_seconds - duration_minutes * 60))
+        hits = sum(1 for error in errors if error <= 30)
+        print(f"{solver:<8} {hits / max(1, len(errors)):>9.1%} {statistics.mean(errors) if errors else 0:>13.1f} "
+              f"{failures:>9} {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}")
+
+def _weighted(rng: random.Random, weights: dict):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+def synthetic_exercises(count: int, rng: random.Random):
+    """Yield (exercise, equipment names, muscle groups, movement types) tuples for a synthetic catalog."""
+    for i in range(1, count + 1):
+        movement_types = [_weighted(rng, MOVEMENT_TYPE_WEIGHTS)]
+        if rng.random() < 0.2:
+            secondary = _weighted(rng, MOVEMENT_TYPE_WEIGHTS)
+            if secondary not in movement_types:
+                movement_types.append(secondary)
+
+        muscle_groups = []
+        for movement_type in movement_types:
+            typical = MOVEMENT_TYPE_MUSCLE_GROUPS[movement_type]
+            # The primary muscle group is nearly always worked, the rest less often
+            muscle_groups.extend(mg for position, mg in enumerate(typical) if rng.random() < 0.9 - 0.15 * position)
+        if rng.random() < 0.1:
+            muscle_groups.append(rng.choice(list(MuscleGroupType)))
+        muscle_groups = list(dict.fromkeys(muscle_groups)) or [MOVEMENT_TYPE_MUSCLE_GROUPS[movement_types[0]][0]]
+
+        equipment = [_weighted(rng, EQUIPMENT_WEIGHTS)]
+        if equipment[0] is not None and rng.random() < 0.1:
+            equipment.append(_weighted(rng, EQUIPMENT_WEIGHTS))
+        equipment = [name for name in dict.fromkeys(equipment) if name is not None]
+
+        exercise = {
+            "id": i,
+            "name": f"Synthetic {movement_types[0].value} {i}",
+            "description": "Generated for benchmarking",
+            "estimated_duration": _weighted(rng, DURATION_WEIGHTS),
+            "intensity": _weighted(rng, INTENSITY_WEIGHTS),
+        }
+        yield exercise, equipment, muscle_groups, movement_types
+
+def create_synthetic_database(url: str, count: int, seed: int = 0):
+    """Create a database at `url` holding `count` synthetic exercises; returns its engine."""
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    equipment_ids = {name: i for i, name in enumerate((name for name in EQUIPMENT_WEIGHTS if name), start=1)}
+    muscle_group_ids = {mg: i for i, mg in enumerate(MuscleGroupType, start=1)}
+
+    exercises, equipment_links, muscle_group_links, movement_type_links = [], [], [], []
+    for exercise, equipment, muscle_groups, movement_types in synthetic_exercises(count, rng):
+        exercises.append(exercise)
+        equipment_links.extend({"exercise_id": exercise["id"], "equipment_id": equipment_ids[name]} for name in equipment)
+        muscle_group_links.extend({"exercise_id": exercise["id"], "muscle_group_id": muscle_group_ids[mg]} for mg in muscle_groups)
+        movement_type_links.extend({"exercise_id": exercise["id"], "movement_type": mt.value} for mt in movement_types)
+
+    # One transaction of executemany inserts per table
+    with engine.begin() as conn:
+        conn.execute(insert(models.Equipment), [{"id": i, "name": name} for name, i in equipment_ids.items()])
+        conn.execute(insert(models.MuscleGroup), [{"id": i, "name": mg} for mg, i in muscle_group_ids.items()])
+        conn.execute(insert(models.Exercise), exercises)
+        conn.execute(insert(models.exercise_equipment), equipment_links)
+        conn.execute(insert(models.exercise_muscle_groups), muscle_group_links)
+        conn.execute(insert(models.exercise_movement_types), movement_type_links)
+    return engine
+
+def measure(call, runs: int, engine, memory_runs: int = 20, reset=None) -> dict:
+    """Latency percentiles, statements per call and peak traced memory of `call`.
+
+    Latency and statement counts come from `runs` untraced calls. Peak memory is
+    measured separately over `memory_runs` calls under tracemalloc (after `reset`,
+    e.g. to drop warm caches), since tracing slows every allocation down.
+    """
+    latencies, failures = [], 0
+    with count_statements(engine) as statements:
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                call()
+            except ValueError:
+                failures += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        for _ in range(min(runs, memory_runs)):
+            try:
+                call()
+            except ValueError:
+                pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": runs,
+        "failures": failures,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.mean(latencies),
+        "queries_per_call": statements[0] / runs,
+        "peak_kib": (peak - baseline) / 1024,
+    }
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def bench_scale(sizes, runs: int, output: str):
+    """Measure every generator entry point against synthetic catalogs of the given sizes."""
+    context = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+    }
+    results = []
+    print(f"{'size':>7} {'entry point':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'peak KiB':>9} {'failures':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            engine = create_synthetic_database(f"sqlite:///{os.path.join(directory, f'synthetic_{size}.db')}", size)
+            db = sessionmaker(bind=engine)()
+            params = random.Random(size)
+            try:
+                catalog = ExerciseCatalog.load(db)
+                generator = WorkoutGenerator(db, catalog=catalog)
+                workouts = []
+                for _ in range(20):
+                    try:
+                        workouts.append([ex.id for ex in generator.generate_workout(30)["exercises"]])
+                    except ValueError:
+                        pass
+
+                def generate():
+                    kwargs = PRESETS[params.choice(list(PRESETS))]
+                    return generator.generate_workout(params.choice(DURATIONS), **kwargs)
+
+                def swap():
+                    workout_ids = params.choice(workouts)
+                    return generator.swap_exercise(workout_ids, params.choice(workout_ids))
+
+                entry_points = {
+                    "catalog_load": (lambda: ExerciseCatalog.load(db), max(1, runs // 50), None),
+                    "generate_workout": (generate, runs, catalog.pool_cache.clear),
+                    "swap_exercise": (swap, runs if workouts else 0, catalog.pool_cache.clear),
+                    "generate_superset": (lambda: generator.generate_superset(5), runs, None),
+                }
+                for name, (call, entry_runs, reset) in entry_points.items():
+                    if not entry_runs:
+                        continue
+                    result = {**context, "size": size, "entry_point": name,
+                              **measure(call, entry_runs, engine, reset=reset)}
+                    results.append(result)
+                    print(f"{size:>7} {name:<18} {result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f} {result['p99_ms']:>8.3f} "
+                          f"{result['queries_per_call']:>8.1f} {result['peak_kib']:>9.1f} {result['failures']:>9}")
+            finally:
+                db.close()
+                engine.dispose()
+
+    with open(output, "a") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    print(f"Appended {len(results)} results to {output}")
+
+def comparison_app() -> FastAPI:
+    """The API plus sync (threadpool) twins of its async read endpoints, so both paths run side by side.
+
+    The response and fragment caches are emptied before every request: otherwise the
+    async endpoints would answer from memory after the first hit and the comparison
+    would measure the caches rather than how each path waits on the database.
+    """
+    from app import main
+
+    app = FastAPI()
+    app.include_router(main.app.router)
+
+    @app.middleware("http")
+    async def bypass_caches(request: Request, call_next):
+        main.catalog_responses.clear()
+        main.exercise_fragments.clear()
+        return await call_next(request)
+
+    @app.get("/sync/exercises/")
+    def sync_read_exercises(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+        return main.json_response(json_array(main.list_exercises(db, skip, limit)[0]))
+
+    @app.get("/sync/exercises/{exercise_id}")
+    def sync_read_exercise(exercise_id: int, db: Session = Depends(get_db)):
+        return main.exercise_detail(db, exercise_id)
+
+    return app
+
+def simulate_query_latency(latency_ms: float):
+    """Delay every statement on the sync and async engines as if the database were across a network.
+
+    The sync path blocks its worker thread, as a sync driver would; the async path awaits,
+    leaving the event loop free to serve other requests.
+    """
+    delay = latency_ms / 1000
+
+    def sync_delay(*args):
+        time.sleep(delay)
+
+    def async_delay(*args):
+        await_only(asyncio.sleep(delay))
+
+    event.listen(engine, "before_cursor_execute", sync_delay)
+    event.listen(get_async_engine().sync_engine, "before_cursor_execute", async_delay)
+
+async def _run_clients(app: FastAPI, paths, clients: int, requests_per_client: int):
+    latencies, errors = [], []
+
+    async def client(http: httpx.AsyncClient, offset: int):
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            response = await http.get(paths[(offset + i) % len(paths)])
+            (latencies if response.is_success else errors).append((time.perf_counter() - start) * 1000)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http, offset) for offset in range(clients)))
+        elapsed = time.perf_counter() - start
+    return latencies, len(errors), elapsed
+
+async def _bench_concurrency(app: FastAPI, workloads, client_counts, requests_per_client: int):
+    # One event loop for every run: the async engine's connection pool is bound to the loop that created it
+    print(f"{'workload':<8} {'path':<6} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for workload, paths in workloads.items():
+        for clients in client_counts:
+            for path in ("sync", "async"):
+                prefixed = [f"/sync{p}" if path == "sync" else p for p in paths]
+                latencies, errors, elapsed = await _run_clients(app, prefixed, clients, requests_per_client)
+                if not latencies:
+                    print(f"{workload:<8} {path:<6} {clients:>8} {'-':>9} {'-':>9} {'-':>9} {'-':>9} {errors:>7}")
+                    continue
+                print(f"{workload:<8} {path:<6} {clients:>8} {len(latencies) / elapsed:>9.0f} {percentile(latencies, 50):>9.2f} "
+                      f"{percentile(latencies, 95):>9.2f} {percentile(latencies, 99):>9.2f} {errors:>7}")
+
+def bench_concurrency(client_counts, requests_per_client: int, query_latency_ms: float = 0):
+    """Throughput and latency of the async read endpoints and their sync twins under concurrent clients.
+
+    Requests go through the ASGI app in-process (no sockets), so the numbers isolate
+    how each path schedules database work: sync handlers share the threadpool
+    (40 threads by default) while async handlers are multiplexed on the event loop.
+    With a local SQLite file queries return almost immediately, so pass
+    `query_latency_ms` to model a networked database such as Postgres.
+    """
+    db = SessionLocal()
+    try:
+        exercise_ids = [row.id for row in db.query(models.Exercise.id).limit(50)]
+    finally:
+        db.close()
+    if not exercise_ids:
+        raise SystemExit("The database has no exercises; seed it first")
+
+    workloads = {
+        "list": ["/exercises/?limit=20"],
+        "detail": [f"/exercises/{exercise_id}" for exercise_id in exercise_ids],
+    }
+    if query_latency_ms:
+        simulate_query_latency(query_latency_ms)
+    asyncio.run(_bench_concurrency(comparison_app(), workloads, client_counts, requests_per_client))
+
+def main():
+    parser = argparse.ArgumentParser(description="Workout generator benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    solvers = subparsers.add_parser("solvers", help="compare duration-fitting solvers")
+    solvers.add_argument("--runs", type=int, default=20, help="runs per duration and preset")
+    scale = subparsers.add_parser("scale", help="measure generator entry points on synthetic catalogs")
+    scale.add_argument("--sizes", type=int, nargs="+", default=SCALE_SIZES, help="catalog sizes in exercises")
+    scale.add_argument("--runs", type=int, default=200, help="calls per entry point and size")
+    scale.add_argument("--output", default="benchmark_results.jsonl", help="JSON lines file results are appended to")
+    concurrency = subparsers.add_parser("concurrency", help="compare sync and async endpoints under concurrent clients")
+    concurrency.add_argument("--clients", type=int, nargs="+", default=[10, 100, 200], help="simultaneous clients")
+    concurrency.add_argument("--requests", type=int, default=20, help="requests per client")
+    concurrency.add_argument("--query-latency-ms", type=float, default=0, help="simulated network latency per statement")
+    args = parser.parse_args()
+
+    # Generator logging is per call and would dominate the measurements
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.command == "solvers":
+        bench_solvers(args.runs)
+    elif args.command == "scale":
+        bench_scale(args.sizes, args.runs, args.output)
+    elif args.command == "concurrency":
+        bench_concurrency(args.clients, args.requests, args.query_latency_ms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from . import models
+from .database import engine
+from .models import MovementType, MuscleGroupType
+from .cache import LRUCache
+import asyncio
+import os
+import threading
+import time
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True, eq=False, slots=True)
+class EquipmentRecord:
+    id: int
+    name: str
+
+@dataclass(frozen=True, eq=False, slots=True)
+class MuscleGroupRecord:
+    id: int
+    name: MuscleGroupType
+
+@dataclass(frozen=True, eq=False, slots=True)
+class ExerciseRecord:
+    """Immutable, detached copy of an exercise row and its associations."""
+    # Position in ExerciseCatalog.all_exercises; also the exercise's bit in catalog bitsets
+    index: int
+    id: int
+    name: str
+    description: Optional[str]
+    estimated_duration: int
+    intensity: str
+    equipment: Tuple[EquipmentRecord, ...]
+    muscle_groups: Tuple[MuscleGroupRecord, ...]
+    movement_types: Tuple[MovementType, ...]
+    is_frontal_or_transverse: bool
+    # Bitmask encodings of the associations, used for allocation-free comparisons
+    muscle_mask: int
+    movement_mask: int
+    equipment_mask: int
+
+FRONTAL_MUSCLE_GROUPS = frozenset({MuscleGroupType.SIDE_DELTOIDS, MuscleGroupType.ADDUCTORS, MuscleGroupType.ABDUCTORS})
+
+# One bit per enum member, in declaration order
+MUSCLE_GROUP_BITS: Dict[MuscleGroupType, int] = {mg: 1 << i for i, mg in enumerate(MuscleGroupType)}
+MOVEMENT_TYPE_BITS: Dict[MovementType, int] = {mt: 1 << i for i, mt in enumerate(MovementType)}
+
+def muscle_group_mask(muscle_groups: Optional[Iterable]) -> int:
+    """Encode muscle groups given as MuscleGroupType members or their string values; unknown names are ignored."""
+    mask = 0
+    for mg in muscle_groups or ():
+        if not isinstance(mg, MuscleGroupType):
+            try:
+                mg = MuscleGroupType(mg)
+            except ValueError:
+                continue
+        mask |= MUSCLE_GROUP_BITS[mg]
+    return mask
+
+def movement_type_mask(movement_types: Optional[Iterable]) -> int:
+    """Encode movement types given as MovementType members or their string values; unknown names are ignored."""
+    mask = 0
+    for mt in movement_types or ():
+        if not isinstance(mt, MovementType):
+            try:
+                mt = MovementType(mt)
+            except ValueError:
+                continue
+        mask |= MOVEMENT_TYPE_BITS[mt]
+    return mask
+
+def is_frontal_or_transverse(movement_types, muscle_groups) -> bool:
+    """Return True for TWIST movements or exercises targeting side_deltoids, adductors or abductors."""
+    if MovementType.TWIST in movement_types:
+        return True
+    return any(mg.name in FRONTAL_MUSCLE_GROUPS for mg in muscle_groups)
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Yield the positions of the set bits of a bitset, lowest first."""
+    # Scanning the binary string keeps the Python-level work proportional to the
+    # number of set bits rather than to the width of the bitset
+    digits = bin(mask)[:1:-1]
+    position = digits.find("1")
+    while position >= 0:
+        yield position
+        position = digits.find("1", position + 1)
+
+def random_bit(mask: int, rng=random) -> int:
+    """Return the position of a uniformly chosen set bit of a non-empty bitset."""
+    # Binary search for the k-th set bit instead of materialising every position
+    k = rng.randrange(mask.bit_count())
+    low, high = 0, mask.bit_length()
+    while high - low > 1:
+        mid = (low + high) // 2
+        if (mask & ((1 << mid) - 1)).bit_count() > k:
+            high = mid
+        else:
+            low = mid
+    return low
+
+def _make_record(index, row, equipment, muscle_groups, movement_types, equipment_bits) -> ExerciseRecord:
+    equipment_mask = 0
+    for equip in equipment:
+        equipment_mask |= equipment_bits[equip.name]
+    return ExerciseRecord(
+        index=index,
+        id=row.id,
+        name=row.name,
+        description=row.description,
+        estimated_duration=row.estimated_duration,
+        intensity=row.intensity or "medium",
+        equipment=tuple(equipment),
+        muscle_groups=tuple(muscle_groups),
+        movement_types=tuple(movement_types),
+        is_frontal_or_transverse=is_frontal_or_transverse(movement_types, muscle_groups),
+        muscle_mask=muscle_group_mask(mg.name for mg in muscle_groups),
+        movement_mask=movement_type_mask(movement_types),
+        equipment_mask=equipment_mask
+    )
+
+class ExerciseCatalog:
+    """Read-only snapshot of every exercise, built with a fixed number of queries."""
+
+    def __init__(self, exercises: List[ExerciseRecord], equipment_bits: Dict[str, int], version: int = 0):
+        self.version = version
+        self.equipment_bits = equipment_bits
+        self.all_exercises = tuple(exercises)
+        self.by_id: Dict[int, ExerciseRecord] = {ex.id: ex for ex in self.all_exercises}
+
+        # Deduplicate exercises by name, keeping the lowest id
+        unique_exercises = {}
+        for ex in self.all_exercises:
+            if ex.name not in unique_exercises:
+                unique_exercises[ex.name] = ex
+        self.exercises = tuple(unique_exercises.values())
+
+        self.by_movement_type: Dict[MovementType, Tuple[ExerciseRecord, ...]] = {
+            movement_type: tuple(ex for ex in self.exercises if movement_type in ex.movement_types)
+            for movement_type in MovementType
+        }
+
+        # Inverted indexes from attribute to a bitset of the deduplicated exercises having it
+        self.unique_mask = self.mask_of(self.exercises)
+        self.muscle_group_index = [0] * len(MUSCLE_GROUP_BITS)
+        self.movement_type_index = [0] * len(MOVEMENT_TYPE_BITS)
+        self.equipment_index: Dict[str, int] = {name: 0 for name in equipment_bits}
+        self.intensity_index: Dict[str, int] = {}
+        self.frontal_transverse_mask = 0
+        equipment_names = {bit: name for name, bit in equipment_bits.items()}
+        for ex in self.exercises:
+            bit = 1 << ex.index
+            for position in iter_bits(ex.muscle_mask):
+                self.muscle_group_index[position] |= bit
+            for position in iter_bits(ex.movement_mask):
+                self.movement_type_index[position] |= bit
+            for position in iter_bits(ex.equipment_mask):
+                self.equipment_index[equipment_names[1 << position]] |= bit
+            self.intensity_index[ex.intensity] = self.intensity_index.get(ex.intensity, 0) | bit
+            if ex.is_frontal_or_transverse:
+                self.frontal_transverse_mask |= bit
+
+        # Bitsets over all_exercises backing the lazily built similarity rows
+        self._movement_members = [0] * len(MOVEMENT_TYPE_BITS)
+        self._muscle_classes: Dict[int, int] = {}
+        for ex in self.all_exercises:
+            bit = 1 << ex.index
+            for position in iter_bits(ex.movement_mask):
+                self._movement_members[position] |= bit
+            self._muscle_classes[ex.muscle_mask] = self._muscle_classes.get(ex.muscle_mask, 0) | bit
+        self._muscle_similarity: Dict[int, int] = {}
+        self._muscle_conflicts: Dict[int, int] = {}
+        # Filtered candidate pools keyed by filter signature, owned by WorkoutGenerator
+        self.pool_cache = LRUCache(maxsize=256)
+        self._similarity_rows: List[Optional[int]] = [None] * len(self.all_exercises)
+
+    def __getstate__(self):
+        # Lazily built rows and the pool cache (which holds a lock) are rebuilt on
+        # demand after unpickling, e.g. in worker processes
+        state = self.__dict__.copy()
+        del state["pool_cache"]
+        state["_muscle_similarity"] = {}
+        state["_muscle_conflicts"] = {}
+        state["_similarity_rows"] = [None] * len(self.all_exercises)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.pool_cache = LRUCache(maxsize=256)
+
+    def mask_of(self, exercises: Iterable[ExerciseRecord]) -> int:
+        """Bitset of the given exercises."""
+        mask = 0
+        for ex in exercises:
+            mask |= 1 << ex.index
+        return mask
+
+    def exercises_in(self, mask: int) -> List[ExerciseRecord]:
+        """Records for the set bits of a bitset, in catalog order."""
+        return [self.all_exercises[position] for position in iter_bits(mask)]
+
+    def with_any_muscle_group(self, muscle_mask: int) -> int:
+        """Bitset of exercises targeting at least one of the encoded muscle groups."""
+        mask = 0
+        for position in iter_bits(muscle_mask):
+            mask |= self.muscle_group_index[position]
+        return mask
+
+    def with_only_muscle_groups(self, muscle_mask: int) -> int:
+        """Bitset of exercises whose muscle groups are all within the encoded muscle groups."""
+        all_muscle_groups = (1 << len(MUSCLE_GROUP_BITS)) - 1
+        return self.unique_mask & ~self.with_any_muscle_group(all_muscle_groups & ~muscle_mask)
+
+    def with_any_equipment(self, equipment: Iterable[str]) -> int:
+        """Bitset of exercises using at least one of the named pieces of equipment."""
+        mask = 0
+        for name in equipment:
+            mask |= self.equipment_index.get(name, 0)
+        return mask
+
+    def with_intensity(self, intensities: Iterable[str]) -> int:
+        """Bitset of exercises with one of the given intensities."""
+        mask = 0
+        for intensity in intensities:
+            mask |= self.intensity_index.get(intensity, 0)
+        return mask
+
+    def with_movement_type(self, movement_type: MovementType) -> int:
+        """Bitset of exercises with the given movement type."""
+        return self.movement_type_index[MOVEMENT_TYPE_BITS[movement_type].bit_length() - 1]
+
+    def conflict_row(self, exercise: ExerciseRecord) -> int:
+        """Bitset of exercises sharing at least one muscle group with `exercise`, i.e. its neighbours in the conflict graph.
+
+        Rows depend only on the muscle mask, so they are computed once per distinct mask.
+        """
+        row = self._muscle_conflicts.get(exercise.muscle_mask)
+        if row is None:
+            row = self.with_any_muscle_group(exercise.muscle_mask)
+            self._muscle_conflicts[exercise.muscle_mask] = row
+        return row
+
+    def similarity_row(self, exercise: ExerciseRecord) -> int:
+        """Bitset of every exercise too similar to follow `exercise` (shared movement type or muscle Jaccard > 0.5).
+
+        Rows are computed on first use and kept for the lifetime of this snapshot.
+        Exercises with the same muscle mask share the muscle part of their row, so
+        building a row costs one pass over the distinct muscle masks, not the catalog.
+        """
+        row = self._similarity_rows[exercise.index]
+        if row is None:
+            row = self._muscle_similarity.get(exercise.muscle_mask)
+            if row is None:
+                row = 0
+                for muscle_mask, members in self._muscle_classes.items():
+                    common_count = (exercise.muscle_mask & muscle_mask).bit_count()
+                    if common_count * 2 > (exercise.muscle_mask | muscle_mask).bit_count():
+                        row |= members
+                self._muscle_similarity[exercise.muscle_mask] = row
+            for position in iter_bits(exercise.movement_mask):
+                row |= self._movement_members[position]
+            self._similarity_rows[exercise.index] = row
+        return row
+
+    @staticmethod
+    def fetch(db: Session) -> Tuple[list, ...]:
+        """Read the rows a snapshot is built from: equipment, muscle groups, the three association tables and the exercises."""
+        return (
+            db.execute(select(models.Equipment.id, models.Equipment.name).order_by(models.Equipment.id)).all(),
+            db.execute(select(models.MuscleGroup.id, models.MuscleGroup.name)).all(),
+            db.execute(select(
+                models.exercise_equipment.c.exercise_id, models.exercise_equipment.c.equipment_id
+            )).all(),
+            db.execute(select(
+                models.exercise_muscle_groups.c.exercise_id, models.exercise_muscle_groups.c.muscle_group_id
+            )).all(),
+            db.execute(select(
+                models.exercise_movement_types.c.exercise_id, models.exercise_movement_types.c.movement_type
+            )).all(),
+            db.execute(select(
+                models.Exercise.id,
+                models.Exercise.name,
+                models.Exercise.description,
+                models.Exercise.estimated_duration,
+                models.Exercise.intensity
+            ).order_by(models.Exercise.id)).all(),
+        )
+
+    @classmethod
+    def build(cls, rows: Tuple[list, ...], version: int = 0) -> "ExerciseCatalog":
+        """Build a snapshot from the rows returned by fetch(); CPU only, no database access."""
+        equipment_rows, muscle_group_rows, equipment_links, muscle_group_links, movement_type_links, exercise_rows = rows
+        equipment = {row.id: EquipmentRecord(id=row.id, name=row.name) for row in equipment_rows}
+        equipment_bits = {equip.name: 1 << i for i, equip in enumerate(equipment.values())}
+        muscle_groups = {row.id: MuscleGroupRecord(id=row.id, name=row.name) for row in muscle_group_rows}
+
+        equipment_by_exercise: Dict[int, List[EquipmentRecord]] = {}
+        for exercise_id, equipment_id in equipment_links:
+            if equipment_id in equipment:
+                equipment_by_exercise.setdefault(exercise_id, []).append(equipment[equipment_id])
+
+        muscle_groups_by_exercise: Dict[int, List[MuscleGroupRecord]] = {}
+        for exercise_id, muscle_group_id in muscle_group_links:
+            if muscle_group_id in muscle_groups:
+                muscle_groups_by_exercise.setdefault(exercise_id, []).append(muscle_groups[muscle_group_id])
+
+        movement_types_by_exercise: Dict[int, List[MovementType]] = {}
+        for exercise_id, movement_type in movement_type_links:
+            movement_types_by_exercise.setdefault(exercise_id, []).append(MovementType(movement_type))
+
+        exercises = [
+            _make_record(
+                index,
+                row,
+                equipment_by_exercise.get(row.id, ()),
+                muscle_groups_by_exercise.get(row.id, ()),
+                movement_types_by_exercise.get(row.id, ()),
+                equipment_bits
+            )
+            for index, row in enumerate(exercise_rows)
+        ]
+        logger.info(f"Loaded exercise catalog version {version} with {len(exercises)} exercises")
+        return cls(exercises, equipment_bits, version)
+
+    @classmethod
+    def load(cls, db: Session, version: int = 0) -> "ExerciseCatalog":
+        """Read the exercise tables and their associations into a new snapshot."""
+        return cls.build(cls.fetch(db), version)
+
+# How long a process trusts the catalog version it last read before reading it again, in seconds
+CATALOG_VERSION_TTL = float(os.environ.get("CATALOG_VERSION_TTL", "1"))
+
+# Process-wide snapshot shared by every WorkoutGenerator. Each worker process keeps
+# its own copy and notices changes through the version stored in the database.
+_catalog: Optional[ExerciseCatalog] = None
+_catalog_lock = threading.Lock()
+# Serialises async loads; the thread lock must not be held across an await on the event loop thread
+_catalog_async_lock = asyncio.Lock()
+# Last version read from the database and when (time.monotonic()); never held across a catalog load
+_catalog_version: Optional[int] = None
+_version_read_at = float("-inf")
+_version_lock = threading.Lock()
+
+def get_catalog(db: Session) -> ExerciseCatalog:
+    """Return the current catalog snapshot, loading it from the database if it is missing or stale."""
+    global _catalog
+    version = catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = ExerciseCatalog.load(db, version)
+        return _catalog
+
+async def get_catalog_async(db: AsyncSession) -> ExerciseCatalog:
+    """Async variant of get_catalog(); a fresh snapshot is returned without loading the exercise tables."""
+    global _catalog
+    version = catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    async with _catalog_async_lock:
+        catalog = _catalog
+        if catalog is None or catalog.version != version:
+            # Queries are awaited on the async session; building the snapshot is CPU work
+            # (seconds for large catalogs), so it runs in the threadpool off the event loop
+            rows = await db.run_sync(ExerciseCatalog.fetch)
+            catalog = await run_in_threadpool(ExerciseCatalog.build, rows, version)
+            with _catalog_lock:
+                if _catalog is None or _catalog.version < version:
+                    _catalog = catalog
+        return catalog
+
+def catalog_version() -> int:
+    """Current catalog version, as stored in the catalog_version table.
+
+    The stored value is read again at most every CATALOG_VERSION_TTL seconds, so changes
+    made by other processes (other workers, python -m app.seed_exercises) show up within
+    that delay, while invalidate_catalog() makes this process's own changes visible at once.
+    """
+    global _catalog_version, _version_read_at
+    if _catalog_version is not None and time.monotonic() - _version_read_at < CATALOG_VERSION_TTL:
+        return _catalog_version
+    with _version_lock:
+        if _catalog_version is None or time.monotonic() - _version_read_at >= CATALOG_VERSION_TTL:
+            with engine.connect() as connection:
+                _catalog_version = connection.execute(
+                    select(models.CatalogVersion.version).where(models.CatalogVersion.id == 1)
+                ).scalar() or 0
+            _version_read_at = time.monotonic()
+        return _catalog_version
+
+def bump_catalog_version(db: Session) -> int:
+    """Increment the stored catalog version in the session's transaction and return the new value.
+
+    Call it in the same transaction as every change to the exercise tables, then pass
+    the result to invalidate_catalog() once the transaction is committed.
+    """
+    table = models.CatalogVersion.__table__
+    version = db.execute(
+        update(table).where(table.c.id == 1).values(version=table.c.version + 1).returning(table.c.version)
+    ).scalar()
+    if version is None:
+        version = 1
+        db.execute(insert(table).values(id=1, version=version))
+    return version
+
+def invalidate_catalog(version: Optional[int] = None) -> None:
+    """Mark the snapshot stale after the exercise tables change; the next get_catalog() rebuilds it.
+
+    Pass the committed version from bump_catalog_version(); without one the stored
+    version is read again on next use.
+    """
+    global _catalog_version, _version_read_at
+    with _version_lock:
+        if version is None:
+            _version_read_at = float("-inf")
+        else:
+            _catalog_version = version
+            _version_read_at = time.monotonic()
@@ -1,5 +1,8 @@
 import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -16,10 +19,65 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Async drivers for each sync dialect; the async engine shares the sync database URL
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+# Async requests are not capped by the threadpool, so the connection pool is what bounds
+# how many of them can wait on the database at once; size it for the expected concurrency
+ASYNC_POOL_SIZE = int(os.environ.get("ASYNC_DB_POOL_SIZE", "20"))
+
+def async_database_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching async driver, e.g. sqlite:// to sqlite+aiosqlite://."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]  # Heroku/Render style URLs
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+# Created on first use so the sync-only tools do not need the async drivers installed
+_async_engine: AsyncEngine = None
+AsyncSessionLocal: async_sessionmaker = None
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            async_database_url(SQLALCHEMY_DATABASE_URL), pool_size=ASYNC_POOL_SIZE, max_overflow=ASYNC_POOL_SIZE
+        )
+        AsyncSessionLocal = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_engine
+
 # Dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@contextmanager
+def count_statements(bind=engine):
+    """Count the SQL statements executed on an engine inside the block.
+
+    Yields a one-element list whose value is updated as statements run, e.g.::
+
+        with count_statements() as statements:
+            generator.generate_workout(45)
+        assert statements[0] == 0
+    """
+    statements = [0]
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += 1
+
+    event.listen(bind, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", _count)
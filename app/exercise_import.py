@@ -0,0 +1,108 @@
+"""Set-based insertion of many exercises.
+
+`insert_exercises` writes a batch with a fixed number of statements whatever
+its size: one query resolving every referenced equipment and muscle group, at
+most one insert per reference table for the missing ones, and one executemany
+insert each for the exercises and their three association tables. It does not
+commit, so callers decide the transaction boundaries.
+"""
+from typing import Dict, List, Sequence
+from sqlalchemy import String, cast, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+from . import models, schemas
+from .models import MuscleGroupType
+
+def resolve_references(db: Session, equipment_names: Sequence[str],
+                       muscle_groups: Sequence[MuscleGroupType]) -> tuple:
+    """Return ({equipment name: id}, {muscle group: id}), inserting the rows that do not exist yet."""
+    equipment_ids: Dict[str, int] = {}
+    muscle_group_ids: Dict[MuscleGroupType, int] = {}
+    if equipment_names or muscle_groups:
+        # Both tables in one round trip; the muscle group column stores enum member names
+        for kind, row_id, name in db.execute(union_all(
+            select(literal("equipment"), models.Equipment.id, models.Equipment.name)
+            .where(models.Equipment.name.in_(equipment_names)),
+            select(literal("muscle_group"), models.MuscleGroup.id, cast(models.MuscleGroup.name, String))
+            .where(models.MuscleGroup.name.in_(muscle_groups))
+        )):
+            if kind == "equipment":
+                equipment_ids[name] = row_id
+            else:
+                muscle_group_ids[MuscleGroupType[name]] = row_id
+
+    missing_equipment = [name for name in equipment_names if name not in equipment_ids]
+    if missing_equipment:
+        for row in db.execute(insert(models.Equipment).returning(models.Equipment.id, models.Equipment.name),
+                              [{"name": name} for name in missing_equipment]):
+            equipment_ids[row.name] = row.id
+    missing_muscle_groups = [mg for mg in muscle_groups if mg not in muscle_group_ids]
+    if missing_muscle_groups:
+        for row in db.execute(insert(models.MuscleGroup).returning(models.MuscleGroup.id, models.MuscleGroup.name),
+                              [{"name": mg} for mg in missing_muscle_groups]):
+            muscle_group_ids[row.name] = row.id
+    return equipment_ids, muscle_group_ids
+
+def insert_exercises(db: Session, exercises: Sequence[schemas.ExerciseCreate]) -> List[schemas.Exercise]:
+    """Insert exercises with their associations and return their response models, in input order."""
+    if not exercises:
+        return []
+    # Repeated names within one exercise are linked once
+    equipment = [list(dict.fromkeys(exercise.equipment)) for exercise in exercises]
+    muscle_groups = [list(dict.fromkeys(exercise.muscle_groups)) for exercise in exercises]
+    movement_types = [list(dict.fromkeys(exercise.movement_types)) for exercise in exercises]
+    equipment_ids, muscle_group_ids = resolve_references(
+        db,
+        list(dict.fromkeys(name for names in equipment for name in names)),
+        list(dict.fromkeys(mg for mgs in muscle_groups for mg in mgs))
+    )
+
+    rows = [
+        {
+            "name": exercise.name,
+            "description": exercise.description,
+            "estimated_duration": exercise.estimated_duration,
+            "intensity": exercise.intensity
+        }
+        for exercise in exercises
+    ]
+    if db.get_bind().dialect.name == "sqlite":
+        # sort_by_parameter_order falls back to one INSERT per row on SQLite. SQLite assigns
+        # rowids in VALUES order and the batches run in order, so sorted ids line up with the input.
+        exercise_ids = sorted(db.execute(insert(models.Exercise).returning(models.Exercise.id), rows).scalars())
+    else:
+        # Other databases give no ordering guarantee, so let SQLAlchemy correlate ids with parameters
+        exercise_ids = list(db.execute(
+            insert(models.Exercise).returning(models.Exercise.id, sort_by_parameter_order=True), rows
+        ).scalars())
+
+    links = [
+        (models.exercise_equipment, [
+            {"exercise_id": exercise_id, "equipment_id": equipment_ids[name]}
+            for exercise_id, names in zip(exercise_ids, equipment) for name in names
+        ]),
+        (models.exercise_muscle_groups, [
+            {"exercise_id": exercise_id, "muscle_group_id": muscle_group_ids[mg]}
+            for exercise_id, mgs in zip(exercise_ids, muscle_groups) for mg in mgs
+        ]),
+        (models.exercise_movement_types, [
+            {"exercise_id": exercise_id, "movement_type": mt.value}
+            for exercise_id, mts in zip(exercise_ids, movement_types) for mt in mts
+        ]),
+    ]
+    for table, rows in links:
+        if rows:
+            db.execute(insert(table), rows)
+
+    return [
+        schemas.Exercise(
+            id=exercise_id,
+            name=exercise.name,
+            description=exercise.description,
+            movement_types=mts,
+            estimated_duration=exercise.estimated_duration,
+            equipment=[schemas.Equipment(id=equipment_ids[name], name=name) for name in names],
+            muscle_groups=[schemas.MuscleGroup(id=muscle_group_ids[mg], name=mg) for mg in mgs],
+            intensity=exercise.intensity
+        )
+        for exercise_id, exercise, names, mgs, mts in zip(exercise_ids, exercises, equipment, muscle_groups, movement_types)
+    ]
@@ -0,0 +1,51 @@
+"""Serialized exercise JSON reused across responses.
+
+Workout and listing responses are assembled by joining per-exercise JSON
+fragments instead of building and serializing a schemas.Exercise for every
+exercise on every request. Fragments belong to one catalog version: the store
+is emptied the first time a newer version is used, and fragments for older
+versions (from requests still holding a stale snapshot) are never stored.
+"""
+from typing import Dict, Iterable, Optional
+import threading
+
+class FragmentStore:
+    """Thread-safe map of exercise id to serialized JSON for the newest catalog version seen."""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._fragments: Dict[int, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _current(self, version: int) -> Optional[Dict[int, bytes]]:
+        if version == self.version:
+            return self._fragments
+        with self._lock:
+            if self.version is None or version > self.version:
+                self.version = version
+                self._fragments = {}
+            return self._fragments if version == self.version else None
+
+    def get(self, version: int, exercise_id: int) -> Optional[bytes]:
+        fragments = self._current(version)
+        return fragments.get(exercise_id) if fragments is not None else None
+
+    def get_many(self, version: int, exercise_ids: Iterable[int]) -> Dict[int, bytes]:
+        """Fragments of the given ids that are stored for `version`; missing ids are left out."""
+        fragments = self._current(version)
+        if fragments is None:
+            return {}
+        return {exercise_id: fragments[exercise_id] for exercise_id in exercise_ids if exercise_id in fragments}
+
+    def set(self, version: int, exercise_id: int, fragment: bytes) -> None:
+        fragments = self._current(version)
+        if fragments is not None:
+            fragments[exercise_id] = fragment
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version = None
+            self._fragments = {}
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
@@ -0,0 +1,142 @@
+"""Offline bulk workout generation.
+
+Loads the exercise catalog once, spreads a grid of generation parameters over a
+process pool and streams one JSON object per workout to an NDJSON file, e.g.:
+
+    python -m app.generate --durations 20 30 45 --intensity-levels 2 3 4 \
+        --equipment-sets kettlebell kettlebell,dumbbell "" --count 100 --output library.ndjson
+"""
+from app.database import SessionLocal
+from app.catalog import ExerciseCatalog
+from app.workout_generator import WorkoutGenerator, SOLVERS
+from collections import deque
+from itertools import islice, product
+from typing import Dict, Iterable, Iterator, List, Optional
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+# Per-process generator, created once by the pool initializer
+_generator: Optional[WorkoutGenerator] = None
+
+def _init_worker(catalog: ExerciseCatalog):
+    global _generator
+    # Failed combinations are recorded in the output; don't also log every one
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    _generator = WorkoutGenerator(catalog=catalog)
+
+def _generate_chunk(tasks: List[Dict]) -> List[str]:
+    """Generate the workouts for a chunk of tasks and return them as NDJSON lines."""
+    lines = []
+    for params in tasks:
+        record = {"params": params}
+        try:
+            workout = _generator.generate_workout(**params)
+            record.update(
+                exercise_ids=[ex.id for ex in workout["exercises"]],
+                rounds=workout["rounds"],
+                estimated_duration_minutes=workout["estimated_duration_minutes"],
+                seed=workout["seed"],
+            )
+        except ValueError as e:
+            record["error"] = str(e)
+        lines.append(json.dumps(record))
+    return lines
+
+def parameter_grid(durations: Iterable[int], intensity_levels: Iterable[int],
+                   equipment_sets: Iterable[Optional[List[str]]], muscle_group_sets: Iterable[Optional[List[str]]],
+                   count: int, solver: str = "random", seed: Optional[int] = None) -> Iterator[Dict]:
+    """Lazily yield generate_workout keyword arguments for every combination, `count` times each.
+
+    With a base seed every task gets its own derived seed, so a run is reproducible.
+    """
+    task_number = 0
+    for duration, intensity_level, equipment, muscle_groups in product(durations, intensity_levels, equipment_sets, muscle_group_sets):
+        for _ in range(count):
+            yield {
+                "duration_minutes": duration,
+                "allowed_muscle_groups": muscle_groups,
+                "allowed_equipment": equipment,
+                "intensity_level": intensity_level,
+                "solver": solver,
+                "seed": seed + task_number if seed is not None else None,
+            }
+            task_number += 1
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def generate_to_file(catalog: ExerciseCatalog, tasks: Iterable[Dict], output, workers: int, chunk_size: int = 200) -> int:
+    """Run tasks on a process pool and write results to `output` in task order; returns the number written.
+
+    At most two chunks per worker are in flight, so memory stays flat however many
+    workouts are generated.
+    """
+    written = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(catalog,)) as pool:
+        pending = deque()
+        for chunk in _chunks(tasks, chunk_size):
+            pending.append(pool.apply_async(_generate_chunk, (chunk,)))
+            if len(pending) >= workers * 2:
+                lines = pending.popleft().get()
+                output.write("\n".join(lines) + "\n")
+                written += len(lines)
+        while pending:
+            lines = pending.popleft().get()
+            output.write("\n".join(lines) + "\n")
+            written += len(lines)
+    return written
+
+def _name_list(value: str) -> Optional[List[str]]:
+    """Parse a comma-separated set; an empty string means no filter."""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    return names or None
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate workouts in bulk to an NDJSON file")
+    parser.add_argument("--durations", type=int, nargs="+", default=[15, 20, 30, 45], help="durations in minutes")
+    parser.add_argument("--intensity-levels", type=int, nargs="+", default=[3], help="intensity levels (1-5)")
+    parser.add_argument("--equipment-sets", type=_name_list, nargs="+", default=[None],
+                        help="comma-separated equipment sets; \"\" for no equipment filter")
+    parser.add_argument("--muscle-group-sets", type=_name_list, nargs="+", default=[None],
+                        help="comma-separated muscle group sets; \"\" for no muscle group filter")
+    parser.add_argument("--count", type=int, default=10, help="workouts per parameter combination")
+    parser.add_argument("--solver", choices=SOLVERS, default="random")
+    parser.add_argument("--seed", type=int, default=None, help="base seed for reproducible output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=200, help="workouts per task sent to a worker")
+    parser.add_argument("--output", default="-", help="output file, or - for stdout")
+    args = parser.parse_args()
+
+    logging.getLogger("app").setLevel(logging.WARNING)
+    db = SessionLocal()
+    try:
+        catalog = ExerciseCatalog.load(db)
+    finally:
+        db.close()
+    if not catalog.exercises:
+        sys.exit("No exercises available in the database")
+
+    tasks = parameter_grid(args.durations, args.intensity_levels, args.equipment_sets, args.muscle_group_sets,
+                           args.count, args.solver, args.seed)
+    start = time.perf_counter()
+    if args.output == "-":
+        written = generate_to_file(catalog, tasks, sys.stdout, args.workers, args.chunk_size)
+    else:
+        with open(args.output, "w") as output:
+            written = generate_to_file(catalog, tasks, output, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {written} workouts in {elapsed:.1f}s ({written / elapsed:.0f}/s) with {args.workers} workers",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Precomputed workout library.
+
+Most requests use one of a few parameter combinations (duration bucket x
+intensity level x common equipment set, with no muscle group restriction).
+This module generates K workouts per combination ahead of time and stores them
+in a compact binary file that is memory-mapped and answered in O(1):
+
+    magic, format version, header length, JSON header, fixed-size records
+
+The JSON header maps each combination key to a (first record, count) pair and
+records the fingerprint of the catalog it was built from. Each record holds
+rounds, exercise count, estimated minutes, the generation seed and up to
+MAX_EXERCISES exercise ids. When the catalog changes and then stays unchanged for
+LIBRARY_REBUILD_DELAY seconds, an API worker rebuilds the library in a separate
+`python -m app.library` process (one at a time, guarded by a lock file next to
+the library); until then requests fall back to live generation.
+
+Build it ahead of time with:
+
+    python -m app.library --workouts-per-combination 50
+"""
+from app.database import SessionLocal
+from app.catalog import ExerciseCatalog, MUSCLE_GROUP_BITS, muscle_group_mask
+from app.workout_generator import WorkoutGenerator, MAX_EXERCISES
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_PATH = os.environ.get("WORKOUT_LIBRARY_PATH", "./workout_library.bin")
+WORKOUTS_PER_COMBINATION = int(os.environ.get("WORKOUT_LIBRARY_SIZE", "20"))
+# Seconds the catalog must stay unchanged before API workers rebuild a stale library
+LIBRARY_REBUILD_DELAY = float(os.environ.get("WORKOUT_LIBRARY_REBUILD_DELAY", "30"))
+# A build lock older than this is left over from a build that died
+BUILD_LOCK_STALE_SECONDS = 3600
+
+DURATION_BUCKETS = [15, 20, 30, 45, 60]
+INTENSITY_LEVELS = [1, 2, 3, 4, 5]
+COMMON_EQUIPMENT_SETS = [
+    None,
+    ["kettlebell"],
+    ["dumbbell"],
+    ["dumbbell", "kettlebell"],
+    ["dumbbell", "kettlebell", "stall bars"],
+]
+
+MAGIC = b"WKLB"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sII")  # magic, format version, header length
+# rounds, exercise count, estimated minutes, seed, exercise ids (zero-padded)
+RECORD = struct.Struct(f"<BBHI{MAX_EXERCISES}i")
+
+ALL_MUSCLE_GROUPS = (1 << len(MUSCLE_GROUP_BITS)) - 1
+
+def combination_key(duration_minutes: int, allowed_muscle_groups: Optional[List[str]],
+                    allowed_equipment: Optional[List[str]], intensity_level: int) -> Optional[str]:
+    """Library key for a request, or None if the library cannot cover it.
+
+    A muscle group list naming every group filters nothing, so it is treated like no list.
+    """
+    if allowed_muscle_groups and muscle_group_mask(allowed_muscle_groups) != ALL_MUSCLE_GROUPS:
+        return None
+    equipment = ",".join(sorted(set(allowed_equipment))) if allowed_equipment else "*"
+    return f"{duration_minutes}|{intensity_level}|{equipment}"
+
+def catalog_fingerprint(catalog: ExerciseCatalog) -> str:
+    """Content hash of the catalog, stable across processes and restarts."""
+    digest = hashlib.sha1()
+    for ex in catalog.all_exercises:
+        equipment = ",".join(sorted(equip.name for equip in ex.equipment))
+        digest.update(f"{ex.id}|{ex.name}|{ex.estimated_duration}|{ex.intensity}|{ex.muscle_mask}|{ex.movement_mask}|{equipment}\n".encode())
+    return digest.hexdigest()
+
+def _combinations() -> Iterator[Tuple[int, int, Optional[List[str]]]]:
+    for duration_minutes in DURATION_BUCKETS:
+        for intensity_level in INTENSITY_LEVELS:
+            for equipment in COMMON_EQUIPMENT_SETS:
+                yield duration_minutes, intensity_level, equipment
+
+def build_library(catalog: ExerciseCatalog, path: str, workouts_per_combination: int = WORKOUTS_PER_COMBINATION) -> int:
+    """Generate the library for `catalog` and atomically replace the file at `path`; returns the record count."""
+    generator = WorkoutGenerator(catalog=catalog)
+    seeds = random.Random()
+    combinations: Dict[str, List[int]] = {}
+    records = bytearray()
+    count = 0
+    for duration_minutes, intensity_level, equipment in _combinations():
+        key = combination_key(duration_minutes, None, equipment, intensity_level)
+        first = count
+        for _ in range(workouts_per_combination):
+            try:
+                workout = generator.generate_workout(
+                    duration_minutes,
+                    allowed_equipment=equipment,
+                    intensity_level=intensity_level,
+                    seed=seeds.randrange(2 ** 32),
+                    # Thousands of library workouts would evict every user-seeded entry
+                    use_cache=False
+                )
+            except ValueError:
+                break  # The combination is infeasible; leave it to live generation
+            ids = [ex.id for ex in workout["exercises"]]
+            records += RECORD.pack(workout["rounds"], len(ids), workout["estimated_duration_minutes"],
+                                   workout["seed"], *ids, *[0] * (MAX_EXERCISES - len(ids)))
+            count += 1
+        if count > first:
+            combinations[key] = [first, count - first]
+
+    header = json.dumps({
+        "catalog_fingerprint": catalog_fingerprint(catalog),
+        "combinations": combinations,
+    }).encode()
+    # A unique temporary file per build, since every worker process may rebuild at once
+    fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(records)
+        os.replace(temporary_path, path)
+    except Exception:
+        os.unlink(temporary_path)
+        raise
+    logger.info(f"Built workout library with {count} workouts for {len(combinations)} combinations at {path}")
+    return count
+
+class WorkoutLibrary:
+    """Read-only, memory-mapped view of a library file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} workout library")
+        header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length])
+        self.catalog_fingerprint: str = header["catalog_fingerprint"]
+        self.combinations: Dict[str, List[int]] = header["combinations"]
+        self._records_offset = PREAMBLE.size + header_length
+
+    def pick(self, key: str, catalog: ExerciseCatalog, rng=random) -> Optional[Dict]:
+        """Return a random stored workout for a combination key, or None if the key is not covered."""
+        entry = self.combinations.get(key)
+        if entry is None:
+            return None
+        first, count = entry
+        rounds, num_exercises, minutes, seed, *ids = RECORD.unpack_from(
+            self._mmap, self._records_offset + (first + rng.randrange(count)) * RECORD.size
+        )
+        return {
+            "exercises": [catalog.by_id[ex_id] for ex_id in ids[:num_exercises]],
+            "rounds": rounds,
+            "estimated_duration_minutes": minutes,
+            "seed": seed,
+        }
+
+    def close(self):
+        self._mmap.close()
+
+# Library matching the current catalog, the catalog version it was checked against,
+# and when and against which file modification time
+_library: Optional[WorkoutLibrary] = None
+_checked_version: Optional[int] = None
+_checked_at = float("-inf")
+_checked_mtime: Optional[float] = None
+_fingerprint: Tuple[Optional[int], str] = (None, "")
+# Pending debounced rebuild and the build process this worker started
+_rebuild_timer: Optional[threading.Timer] = None
+_build_process: Optional[subprocess.Popen] = None
+_library_lock = threading.Lock()
+
+def _load(path: str) -> Optional[WorkoutLibrary]:
+    if not os.path.exists(path):
+        return None
+    try:
+        return WorkoutLibrary(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable workout library {path}: {e}")
+        return None
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _lock_path(path: str) -> str:
+    return path + ".lock"
+
+def _build_locked(path: str) -> bool:
+    """Whether a build of the library at `path` is running, in this or another process."""
+    lock_mtime = _mtime(_lock_path(path))
+    return lock_mtime is not None and time.time() - lock_mtime < BUILD_LOCK_STALE_SECONDS
+
+def _start_build(path: str):
+    """Build the library in a separate `python -m app.library` process, unless one is already running."""
+    global _rebuild_timer, _build_process
+    with _library_lock:
+        _rebuild_timer = None
+        if _build_process is not None and _build_process.poll() is None:
+            return
+        if _build_locked(path):
+            return
+        logger.info(f"Starting a workout library build for {path}")
+        _build_process = subprocess.Popen(
+            [sys.executable, "-m", "app.library", "--output", os.path.abspath(path),
+             "--workouts-per-combination", str(WORKOUTS_PER_COMBINATION)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=subprocess.DEVNULL
+        )
+
+def _schedule_build(path: str, restart: bool):
+    """Start a build once the catalog has stayed unchanged for LIBRARY_REBUILD_DELAY seconds.
+
+    Called with _library_lock held. `restart` (a new catalog version) pushes a pending
+    build back, so a burst of writes leads to one build.
+    """
+    global _rebuild_timer
+    if _rebuild_timer is not None:
+        if not restart:
+            return
+        _rebuild_timer.cancel()
+    _rebuild_timer = threading.Timer(LIBRARY_REBUILD_DELAY, _start_build, args=(path,))
+    _rebuild_timer.daemon = True
+    _rebuild_timer.start()
+
+def get_library(catalog: ExerciseCatalog, path: str = LIBRARY_PATH) -> Optional[WorkoutLibrary]:
+    """Return the library built from this catalog, or None and schedule a build if it is missing or stale.
+
+    Until a matching library exists the file is looked at again every LIBRARY_REBUILD_DELAY
+    seconds, so a library written by another process is picked up.
+    """
+    global _library, _checked_version, _checked_at, _checked_mtime, _fingerprint
+    if not path:
+        return None
+    if _checked_version == catalog.version and (_library is not None or time.monotonic() - _checked_at < LIBRARY_REBUILD_DELAY):
+        return _library
+    with _library_lock:
+        changed = _checked_version != catalog.version
+        if not changed and (_library is not None or time.monotonic() - _checked_at < LIBRARY_REBUILD_DELAY):
+            return _library
+        _checked_version = catalog.version
+        _checked_at = time.monotonic()
+        mtime = _mtime(path)
+        if changed or mtime != _checked_mtime:
+            _checked_mtime = mtime
+            if _fingerprint[0] != catalog.version:
+                _fingerprint = (catalog.version, catalog_fingerprint(catalog))
+            library = _load(path)
+            if library is not None and library.catalog_fingerprint != _fingerprint[1]:
+                library = None
+            _library = library
+        if _library is None and catalog.exercises:
+            _schedule_build(path, restart=changed)
+        return _library
+
+def lookup_workout(catalog: ExerciseCatalog, duration_minutes: int, allowed_muscle_groups: Optional[List[str]],
+                   allowed_equipment: Optional[List[str]], intensity_level: int) -> Optional[Dict]:
+    """Serve a workout from the library if it covers the request, otherwise return None."""
+    key = combination_key(duration_minutes, allowed_muscle_groups, allowed_equipment, intensity_level)
+    if key is None:
+        return None
+    library = get_library(catalog)
+    if library is None:
+        return None
+    return library.pick(key, catalog)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed workout library")
+    parser.add_argument("--workouts-per-combination", type=int, default=WORKOUTS_PER_COMBINATION)
+    parser.add_argument("--output", default=LIBRARY_PATH)
+    args = parser.parse_args()
+
+    logging.getLogger("app").setLevel(logging.WARNING)
+    # One build at a time per file, whether started by hand or by API workers
+    lock_path = _lock_path(args.output)
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        if _build_locked(args.output):
+            raise SystemExit(f"{lock_path} exists; another build is running")
+        # Left behind by a build that died; take it over
+        os.utime(lock_path)
+    try:
+        db = SessionLocal()
+        try:
+            catalog = ExerciseCatalog.load(db)
+        finally:
+            db.close()
+        count = build_library(catalog, args.output, args.workouts_per_combination)
+    finally:
+        os.unlink(lock_path)
+    print(f"Wrote {count} workouts to {args.output}")
+
+if __name__ == "__main__":
+    main()
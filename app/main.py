@@ -1,15 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Body
+from fastapi import FastAPI, Depends, HTTPException, Query, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, exists, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from pydantic import TypeAdapter, ValidationError
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
 from . import models, schemas
-from .database import SessionLocal, engine
+from .database import SessionLocal, engine, get_async_db
 from .models import MovementType, MuscleGroupType
 from .workout_generator import WorkoutGenerator
+from .exercise_import import insert_exercises
+from .catalog import bump_catalog_version, catalog_version, get_catalog_async, invalidate_catalog
+from .cache import LRUCache
+from .fragments import FragmentStore, json_array
+from .library import lookup_workout
+from .pagination import decode_cursor, encode_cursor
+from . import timing
+from .timing import phase
 from app.seed_exercises import seed_exercises
+import json
 import logging
+import secrets
+import sys
 from sqlalchemy import text
 
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = schemas.MAX_BATCH_SIZE
+# Rows fetched from the server-side cursor per round trip by /exercises/export
+EXPORT_BATCH_SIZE = 1000
+# Default exercises per transaction for /exercises/import, and the longest accepted line
+IMPORT_CHUNK_SIZE = 1000
+MAX_IMPORT_LINE_BYTES = 1 << 20
+# Ids bound per IN list when filling exercise fragments
+ID_BATCH_SIZE = 500
+
+# Distinguishes this process's ETags from those of other runs, in case the database (and its version counter) was recreated
+CATALOG_ETAG_PREFIX = secrets.token_hex(4)
+# Serialized bodies of the catalog listings, keyed by ETag and query
+catalog_responses = LRUCache(maxsize=256)
+# Serialized schemas.Exercise JSON per exercise id for the current catalog version
+exercise_fragments = FragmentStore()
+name_list_adapter = TypeAdapter(List[str])
+
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
 
@@ -25,8 +60,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor", "ETag"],
 )
 
+# Added after CORS so that it wraps it, as the Server-Timing total covers the whole request
+app.add_middleware(timing.ServerTimingMiddleware)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -35,10 +74,26 @@ def get_db():
     finally:
         db.close()
 
-def get_exercise_movement_types(db: Session, exercise_id: int) -> List[MovementType]:
-    stmt = models.exercise_movement_types.select().where(models.exercise_movement_types.c.exercise_id == exercise_id)
-    result = db.execute(stmt)
-    return [MovementType(mt[1]) for mt in result]
+def query_exercises(db: Session):
+    """Exercise query that loads equipment, muscle groups and movement types in one extra statement each."""
+    return db.query(models.Exercise).options(
+        selectinload(models.Exercise.equipment),
+        selectinload(models.Exercise.muscle_groups),
+        selectinload(models.Exercise.movement_type_links)
+    )
+
+def exercise_model(exercise: models.Exercise) -> schemas.Exercise:
+    """Build the response model for an exercise loaded with query_exercises()."""
+    return schemas.Exercise(
+        id=exercise.id,
+        name=exercise.name,
+        description=exercise.description,
+        movement_types=exercise.movement_types,
+        estimated_duration=exercise.estimated_duration,
+        equipment=exercise.equipment,
+        muscle_groups=exercise.muscle_groups,
+        intensity=getattr(exercise, "intensity", None) or "medium"
+    )
 
 @app.post("/exercises/", response_model=schemas.Exercise)
 def create_exercise(exercise: schemas.ExerciseCreate, db: Session = Depends(get_db)):
@@ -79,124 +134,481 @@ def create_exercise(exercise: schemas.ExerciseCreate, db: Session = Depends(get_
         )
         db.execute(stmt)
 
+    version = bump_catalog_version(db)
     db.commit()
-    db.refresh(db_exercise)
-    
-    # Get movement types for response
-    movement_types = get_exercise_movement_types(db, db_exercise.id)
+    invalidate_catalog(version)
     
-    # Create response object
-    response = schemas.Exercise(
-        id=db_exercise.id,
-        name=db_exercise.name,
-        description=db_exercise.description,
-        movement_types=movement_types,
-        estimated_duration=db_exercise.estimated_duration,
-        equipment=db_exercise.equipment,
-        muscle_groups=db_exercise.muscle_groups
-    )
-    return response
+    # Reload with its associations for the response
+    db_exercise = query_exercises(db).filter(models.Exercise.id == db_exercise.id).one()
+    return exercise_model(db_exercise)
 
 @app.post("/exercises/bulk", response_model=List[schemas.Exercise])
 def create_exercises(exercises: List[schemas.ExerciseCreate], db: Session = Depends(get_db)):
-    created_exercises = []
-    for exercise in exercises:
-        created_exercises.append(create_exercise(exercise, db))
+    """Create many exercises in one transaction with a fixed number of statements."""
+    created_exercises = insert_exercises(db, exercises)
+    version = bump_catalog_version(db)
+    db.commit()
+    invalidate_catalog(version)
     return created_exercises
 
-@app.get("/exercises/", response_model=List[schemas.Exercise])
-def read_exercises(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    exercises = db.query(models.Exercise).offset(skip).limit(limit).all()
-    response_exercises = []
-    for exercise in exercises:
-        movement_types = get_exercise_movement_types(db, exercise.id)
-        intensity = getattr(exercise, "intensity", None) or "medium"
-        response_exercises.append(schemas.Exercise(
-            id=exercise.id,
-            name=exercise.name,
-            description=exercise.description,
-            movement_types=movement_types,
-            estimated_duration=exercise.estimated_duration,
-            equipment=exercise.equipment,
-            muscle_groups=exercise.muscle_groups,
-            intensity=intensity
+@app.post("/exercises/import")
+async def import_exercises(
+    request: Request,
+    chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create exercises from an NDJSON body (one ExerciseCreate per line, as written by /exercises/export).
+
+    The body is parsed as it arrives and every `chunk_size` exercises are committed
+    in their own transaction, so memory does not grow with the size of the import.
+    An invalid line stops the import with a 400; chunks committed before it are kept.
+    """
+    imported = 0
+    chunk: List[schemas.ExerciseCreate] = []
+    line_number = 0
+
+    async def flush():
+        nonlocal imported
+        await db.run_sync(insert_exercises, chunk)
+        version = await db.run_sync(bump_catalog_version)
+        await db.commit()
+        invalidate_catalog(version)
+        imported += len(chunk)
+        chunk.clear()
+
+    async def lines():
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *complete, buffer = buffer.split(b"\n")
+            if len(buffer) > MAX_IMPORT_LINE_BYTES:
+                raise ValueError(f"line longer than {MAX_IMPORT_LINE_BYTES} bytes")
+            for line in complete:
+                yield line
+        yield buffer
+
+    try:
+        async for line in lines():
+            line_number += 1
+            if not line.strip():
+                continue
+            chunk.append(schemas.ExerciseCreate.model_validate_json(line))
+            if len(chunk) >= chunk_size:
+                await flush()
+        if chunk:
+            await flush()
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Line {line_number}: {e}; {imported} exercises were imported before it"
+        )
+    return {"imported": imported}
+
+def exercise_fragment(exercise, version: int) -> bytes:
+    """Serialized response JSON of a catalog ExerciseRecord, built once per catalog version."""
+    fragment = exercise_fragments.get(version, exercise.id)
+    if fragment is None:
+        fragment = exercise_response(exercise).model_dump_json().encode()
+        exercise_fragments.set(version, exercise.id, fragment)
+    return fragment
+
+def chunks(items: list, size: int) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def list_exercises(db: Session, skip: int, limit: int, after_id: Optional[int] = None,
+                   version: Optional[int] = None, filters: Sequence = ()) -> Tuple[List[bytes], Optional[str]]:
+    """Return the serialized exercises of a page ordered by id and the cursor of the next page (None on the last page).
+
+    With after_id the page starts after that id (keyset pagination, skip is ignored),
+    so every page costs the same as the first and inserts do not shift later pages.
+    `filters` are SQL conditions on the exercises, e.g. from exercise_search_filters().
+    """
+    if version is None:
+        version = catalog_version()
+
+    query = db.query(models.Exercise.id).filter(*filters).order_by(models.Exercise.id)
+    if after_id is not None:
+        query = query.filter(models.Exercise.id > after_id)
+    else:
+        query = query.offset(skip)
+    # One extra row tells whether there is a next page
+    ids = [row.id for row in query.limit(limit + 1)]
+    next_cursor = encode_cursor(ids[limit - 1]) if len(ids) > limit else None
+    ids = ids[:limit]
+    fragments = exercise_fragments.get_many(version, ids)
+    missing = [exercise_id for exercise_id in ids if exercise_id not in fragments]
+    # Serialize what is not cached yet from the full rows: four statements per ID_BATCH_SIZE
+    # exercises, the rows and then one per association
+    for batch in chunks(missing, ID_BATCH_SIZE):
+        for exercise in query_exercises(db).filter(models.Exercise.id.in_(batch)):
+            fragments[exercise.id] = exercise_model(exercise).model_dump_json().encode()
+            exercise_fragments.set(version, exercise.id, fragments[exercise.id])
+    return [fragments[exercise_id] for exercise_id in ids if exercise_id in fragments], next_cursor
+
+def exercise_search_filters(
+    equipment: Optional[List[str]] = None,
+    muscle_groups: Optional[List[MuscleGroupType]] = None,
+    movement_types: Optional[List[MovementType]] = None,
+    intensity: Optional[List[str]] = None,
+    min_duration: Optional[int] = None,
+    max_duration: Optional[int] = None,
+    name_prefix: Optional[str] = None
+) -> list:
+    """SQL conditions selecting exercises that match every given filter (and any value within a list filter)."""
+    exercise_id = models.Exercise.id
+    filters = []
+    if equipment:
+        filters.append(exists().where(
+            models.exercise_equipment.c.exercise_id == exercise_id,
+            models.exercise_equipment.c.equipment_id == models.Equipment.id,
+            models.Equipment.name.in_(equipment)
+        ))
+    if muscle_groups:
+        filters.append(exists().where(
+            models.exercise_muscle_groups.c.exercise_id == exercise_id,
+            models.exercise_muscle_groups.c.muscle_group_id == models.MuscleGroup.id,
+            models.MuscleGroup.name.in_(muscle_groups)
+        ))
+    if movement_types:
+        filters.append(exists().where(
+            models.exercise_movement_types.c.exercise_id == exercise_id,
+            models.exercise_movement_types.c.movement_type.in_([mt.value for mt in movement_types])
         ))
-    return response_exercises
+    if intensity:
+        condition = models.Exercise.intensity.in_(intensity)
+        if "medium" in intensity:
+            # Rows without an intensity are served as medium
+            condition = or_(condition, models.Exercise.intensity.is_(None))
+        filters.append(condition)
+    if min_duration is not None:
+        filters.append(models.Exercise.estimated_duration >= min_duration)
+    if max_duration is not None:
+        filters.append(models.Exercise.estimated_duration <= max_duration)
+    if name_prefix:
+        # The range lets the name index narrow the scan; startswith keeps the match exact under any collation
+        filters.extend([
+            models.Exercise.name >= name_prefix,
+            models.Exercise.name.startswith(name_prefix, autoescape=True)
+        ])
+        if ord(name_prefix[-1]) < sys.maxunicode:
+            # No upper bound after the last code point; the lower bound and startswith suffice
+            filters.append(models.Exercise.name < name_prefix[:-1] + chr(ord(name_prefix[-1]) + 1))
+    return filters
+
+def catalog_etag() -> str:
+    """ETag of the catalog endpoints; it changes whenever the stored catalog version is bumped."""
+    return f'"{CATALOG_ETAG_PREFIX}-{catalog_version()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header names `etag` (weak comparison) or is `*`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def catalog_response(body: bytes, etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache", **(headers or {})})
+
+@app.get("/exercises/", response_model=List[schemas.Exercise])
+async def read_exercises(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List exercises ordered by id.
+
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page;
+    the header is absent on the last page. Responses carry the catalog ETag, and
+    If-None-Match requests for an unchanged catalog get a 304 without a query.
+    """
+    etag = catalog_etag()
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    try:
+        after_id = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = (etag, "exercises", skip if after_id is None else 0, limit, after_id)
+    cached = catalog_responses.get(key)
+    if cached is None:
+        # The ORM work runs on the session's sync facade; its queries are awaited without blocking the event loop
+        fragments, next_cursor = await db.run_sync(list_exercises, skip, limit, after_id, catalog_version())
+        cached = (json_array(fragments), next_cursor)
+        catalog_responses.set(key, cached)
+    body, next_cursor = cached
+    return catalog_response(body, etag, {"X-Next-Cursor": next_cursor} if next_cursor is not None else None)
+
+@app.get("/exercises/search", response_model=List[schemas.Exercise])
+async def search_exercises(
+    request: Request,
+    equipment: List[str] = Query(None),
+    muscle_groups: List[MuscleGroupType] = Query(None),
+    movement_types: List[MovementType] = Query(None),
+    intensity: List[str] = Query(None),
+    min_duration: Optional[int] = Query(None, ge=0),
+    max_duration: Optional[int] = Query(None, ge=0),
+    name_prefix: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List exercises matching every given filter, ordered by id and paginated like /exercises/.
+
+    List filters match exercises with any of the given values: equipment, muscle groups and
+    movement types the exercise uses, and intensities. Durations are in seconds, like
+    estimated_duration, and name_prefix is case-sensitive. The filters run as one SQL query.
+    """
+    etag = catalog_etag()
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    try:
+        after_id = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = (etag, "search", str(request.query_params))
+    cached = catalog_responses.get(key)
+    if cached is None:
+        filters = exercise_search_filters(equipment, muscle_groups, movement_types, intensity,
+                                          min_duration, max_duration, name_prefix)
+        fragments, next_cursor = await db.run_sync(list_exercises, 0, limit, after_id, catalog_version(), filters)
+        cached = (json_array(fragments), next_cursor)
+        catalog_responses.set(key, cached)
+    body, next_cursor = cached
+    return catalog_response(body, etag, {"X-Next-Cursor": next_cursor} if next_cursor is not None else None)
 
 @app.get("/exercises/names", response_model=List[str])
-def read_exercise_names(db: Session = Depends(get_db)):
+async def read_exercise_names(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get just the names of all exercises."""
-    exercises = db.query(models.Exercise).all()
-    return [exercise.name for exercise in exercises]
+    etag = catalog_etag()
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    key = (etag, "names")
+    body = catalog_responses.get(key)
+    if body is None:
+        result = await db.execute(select(models.Exercise.name))
+        body = name_list_adapter.dump_json(list(result.scalars()))
+        catalog_responses.set(key, body)
+    return catalog_response(body, etag)
 
-@app.get("/exercises/{exercise_id}", response_model=schemas.Exercise)
-def read_exercise(exercise_id: int, db: Session = Depends(get_db)):
-    exercise = db.query(models.Exercise).filter(models.Exercise.id == exercise_id).first()
+class _AssociationStream:
+    """Rows of (exercise_id, value) ordered by exercise_id, consumed alongside the exercises."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._next = next(self._rows, None)
+
+    def take(self, exercise_id: int) -> list:
+        """Values linked to `exercise_id`; ids must be requested in increasing order."""
+        values = []
+        while self._next is not None and self._next[0] <= exercise_id:
+            if self._next[0] == exercise_id:
+                values.append(self._next[1])
+            self._next = next(self._rows, None)
+        return values
+
+def export_lines() -> Iterator[bytes]:
+    """NDJSON lines of every exercise in id order, in ExerciseCreate form, one cursor batch at a time.
+
+    The exercises and each association table are read as separate streams ordered by
+    exercise id and merged here, so memory stays constant and each table is read in
+    a single pass.
+    """
+    db = SessionLocal()
+    try:
+        def stream(statement):
+            return db.execute(statement, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+
+        equipment = _AssociationStream(stream(
+            select(models.exercise_equipment.c.exercise_id, models.Equipment.name)
+            .join(models.Equipment, models.Equipment.id == models.exercise_equipment.c.equipment_id)
+            .order_by(models.exercise_equipment.c.exercise_id)
+        ))
+        muscle_groups = _AssociationStream(stream(
+            select(models.exercise_muscle_groups.c.exercise_id, models.MuscleGroup.name)
+            .join(models.MuscleGroup, models.MuscleGroup.id == models.exercise_muscle_groups.c.muscle_group_id)
+            .order_by(models.exercise_muscle_groups.c.exercise_id)
+        ))
+        movement_types = _AssociationStream(stream(
+            select(models.exercise_movement_types.c.exercise_id, models.exercise_movement_types.c.movement_type)
+            .order_by(models.exercise_movement_types.c.exercise_id)
+        ))
+        exercises = stream(select(
+            models.Exercise.id,
+            models.Exercise.name,
+            models.Exercise.description,
+            models.Exercise.estimated_duration,
+            models.Exercise.intensity
+        ).order_by(models.Exercise.id))
+
+        for rows in exercises.partitions():
+            yield b"".join(
+                schemas.ExerciseCreate(
+                    name=row.name,
+                    description=row.description,
+                    movement_types=movement_types.take(row.id),
+                    estimated_duration=row.estimated_duration,
+                    equipment=equipment.take(row.id),
+                    muscle_groups=muscle_groups.take(row.id),
+                    intensity=row.intensity or "medium"
+                ).model_dump_json().encode() + b"\n"
+                for row in rows
+            )
+    finally:
+        db.close()
+
+@app.get("/exercises/export")
+def export_exercises():
+    """Stream every exercise as NDJSON, in the format /exercises/import accepts."""
+    # The generator owns its session: it runs after the endpoint's dependencies are closed
+    return StreamingResponse(export_lines(), media_type="application/x-ndjson")
+
+def exercise_detail(db: Session, exercise_id: int) -> Optional[schemas.Exercise]:
+    exercise = query_exercises(db).filter(models.Exercise.id == exercise_id).first()
     if exercise is None:
-        raise HTTPException(status_code=404, detail="Exercise not found")
-    
-    movement_types = get_exercise_movement_types(db, exercise.id)
+        return None
+    return exercise_model(exercise)
+
+@app.get("/exercises/{exercise_id}", response_model=schemas.Exercise)
+async def read_exercise(exercise_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    etag = catalog_etag()
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    version = catalog_version()
+    body = exercise_fragments.get(version, exercise_id)
+    if body is None:
+        exercise = await db.run_sync(exercise_detail, exercise_id)
+        if exercise is None:
+            raise HTTPException(status_code=404, detail="Exercise not found")
+        body = exercise.model_dump_json().encode()
+        exercise_fragments.set(version, exercise_id, body)
+    return catalog_response(body, etag)
+
+def exercise_response(exercise) -> schemas.Exercise:
+    """Build the response model for a catalog ExerciseRecord."""
     return schemas.Exercise(
         id=exercise.id,
         name=exercise.name,
         description=exercise.description,
-        movement_types=movement_types,
+        movement_types=list(exercise.movement_types),
         estimated_duration=exercise.estimated_duration,
         equipment=exercise.equipment,
-        muscle_groups=exercise.muscle_groups
+        muscle_groups=exercise.muscle_groups,
+        intensity=exercise.intensity
     )
 
+def workout_json(workout: dict, version: int) -> bytes:
+    """Serialize a generated workout as schemas.Workout JSON from the exercises' cached fragments."""
+    envelope = json.dumps({
+        "rounds": workout["rounds"],
+        "estimated_duration_minutes": workout["estimated_duration_minutes"],
+        "seed": workout.get("seed")
+    }, separators=(",", ":")).encode()
+    exercises = json_array(exercise_fragment(exercise, version) for exercise in workout["exercises"])
+    return b'{"exercises":' + exercises + b"," + envelope[1:]
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
 @app.get("/workouts/generate", response_model=schemas.Workout)
-def generate_workout(
-    duration_minutes: int,
+async def generate_workout(
+    duration_minutes: int = Query(..., ge=1, le=schemas.MAX_DURATION_MINUTES),
     muscle_groups: list[str] = Query(None),
     equipment: list[str] = Query(None),
     intensity_level: int = Query(3),
-    db: Session = Depends(get_db)
+    solver: str = Query("random"),
+    seed: Optional[int] = Query(None),
+    selection: str = Query("random"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Generate a workout with the specified duration in minutes, allowed muscle groups, allowed equipment, and intensity level (1-5)."""
+    """Generate a workout with the specified duration in minutes, allowed muscle groups, allowed equipment, and intensity level (1-5).
+
+    solver is "random" (default) or "exact" for the closest duration fit; selection is
+    "random" (default) or "scored" to favour balanced, well-fitting exercises. The response
+    includes the seed used; passing it back replays the same workout. Unseeded requests
+    for common combinations are served from the precomputed workout library.
+    """
     try:
-        generator = WorkoutGenerator(db)
-        workout = generator.generate_workout(
-            duration_minutes, 
-            allowed_muscle_groups=muscle_groups,
-            allowed_equipment=equipment,
-            intensity_level=intensity_level
-        )
-        
-        # Convert exercises to response format
-        exercises = []
-        for exercise in workout["exercises"]:
-            movement_types = get_exercise_movement_types(db, exercise.id)
-            exercise_response = schemas.Exercise(
-                id=exercise.id,
-                name=exercise.name,
-                description=exercise.description,
-                movement_types=movement_types,
-                estimated_duration=exercise.estimated_duration,
-                equipment=exercise.equipment,
-                muscle_groups=exercise.muscle_groups,
-                intensity=exercise.intensity
+        with phase("catalog"):
+            catalog = await get_catalog_async(db)
+
+        def respond() -> bytes:
+            if seed is None and solver == "random" and selection == "random":
+                with phase("library"):
+                    workout = lookup_workout(catalog, duration_minutes, muscle_groups, equipment, intensity_level)
+                if workout is not None:
+                    with phase("serialize"):
+                        return workout_json(workout, catalog.version)
+            generator = WorkoutGenerator(catalog=catalog)
+            workout = generator.generate_workout(
+                duration_minutes,
+                allowed_muscle_groups=muscle_groups,
+                allowed_equipment=equipment,
+                intensity_level=intensity_level,
+                solver=solver,
+                seed=seed,
+                selection=selection
             )
-            exercises.append(exercise_response)
-        
-        workout_response = schemas.Workout(
-            exercises=exercises,
-            rounds=workout["rounds"],
-            estimated_duration_minutes=workout["estimated_duration_minutes"]
-        )
-        
-        return workout_response
+            with phase("serialize"):
+                return workout_json(workout, catalog.version)
+
+        # Generation and serialization are CPU work; the threadpool keeps the event loop free for other requests
+        return json_response(await run_in_threadpool(respond))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in generate_workout endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/workouts/generate/batch", response_model=List[schemas.Workout])
+def generate_workout_batch(request: schemas.WorkoutBatchRequest, db: Session = Depends(get_db)):
+    """Generate many workouts in one pass, from a list of parameter sets or one set plus a count."""
+    size = len(request.workouts) + (request.count if request.params is not None else 0)
+    if not size:
+        raise HTTPException(status_code=400, detail="Provide 'workouts' or 'params'")
+    # Checked before expanding `params`, so an oversized count is never materialised
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} workouts per batch")
+    param_sets = list(request.workouts)
+    if request.params is not None:
+        if request.params.seed is None:
+            param_sets.extend([request.params] * request.count)
+        else:
+            # Each copy gets its own derived seed, as in generate.parameter_grid, so the batch stays reproducible
+            param_sets.extend(request.params.model_copy(update={"seed": request.params.seed + i}) for i in range(request.count))
+    try:
+        generator = WorkoutGenerator(db)
+        workouts = generator.generate_workouts([
+            {
+                "duration_minutes": params.duration_minutes,
+                "allowed_muscle_groups": params.muscle_groups,
+                "allowed_equipment": params.equipment,
+                "intensity_level": params.intensity_level,
+                "solver": params.solver,
+                "seed": params.seed,
+                "selection": params.selection
+            }
+            for params in param_sets
+        ])
+        version = generator.catalog.version
+        return json_response(json_array(workout_json(workout, version) for workout in workouts))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in generate_workout_batch endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/seed")
 def seed(db: Session = Depends(get_db)):
     try:
         result = seed_exercises(db)
+        invalidate_catalog()
         return {
             "status": "seeded",
             "summary": {
@@ -209,65 +621,151 @@ def seed(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/exercises/cleanup", response_model=List[str])
-def cleanup_duplicates(db: Session = Depends(get_db)):
-    """Remove duplicate exercises, keeping only the first occurrence of each name."""
-    # Get all exercises
-    all_exercises = db.query(models.Exercise).all()
-    
-    # Track seen names and exercises to delete
-    seen_names = set()
-    to_delete = []
-    
-    for exercise in all_exercises:
-        if exercise.name in seen_names:
-            to_delete.append(exercise)
-        else:
-            seen_names.add(exercise.name)
-    
-    # Delete duplicates
-    deleted_names = []
-    for exercise in to_delete:
-        deleted_names.append(exercise.name)
-        db.delete(exercise)
-    
-    db.commit()
+@app.post("/exercises/cleanup", response_model=Union[List[str], schemas.CleanupDryRun])
+def cleanup_duplicates(dry_run: bool = Query(False), db: Session = Depends(get_db)):
+    """Remove duplicate exercises, keeping only the first occurrence of each name, and return the deleted names.
+
+    Their equipment, muscle group and movement type links are deleted with them. With
+    dry_run nothing changes and the response is a CleanupDryRun with the duplicated names
+    and the number of rows each table would lose.
+    """
+    keepers = (
+        select(models.Exercise.name, func.min(models.Exercise.id).label("keep_id"))
+        .group_by(models.Exercise.name)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    duplicates = (
+        select(models.Exercise.id)
+        .join(keepers, keepers.c.name == models.Exercise.name)
+        .where(models.Exercise.id != keepers.c.keep_id)
+    )
+    # Association rows first: they are found through the exercises being deleted
+    tables = {
+        "equipment_links": models.exercise_equipment.c.exercise_id,
+        "muscle_group_links": models.exercise_muscle_groups.c.exercise_id,
+        "movement_type_links": models.exercise_movement_types.c.exercise_id,
+        "exercises": models.Exercise.__table__.c.id,
+    }
+
+    if dry_run:
+        # Every count in one statement
+        counts = db.execute(select(*[
+            select(func.count()).select_from(column.table).where(column.in_(duplicates)).scalar_subquery().label(key)
+            for key, column in tables.items()
+        ])).one()._asdict()
+        duplicate_names = list(db.execute(
+            select(models.Exercise.name).where(models.Exercise.id.in_(duplicates))
+            .group_by(models.Exercise.name).order_by(models.Exercise.name)
+        ).scalars())
+        return schemas.CleanupDryRun(duplicate_names=duplicate_names, **counts)
+
+    deleted_names = list(db.execute(
+        select(models.Exercise.name).where(models.Exercise.id.in_(duplicates)).order_by(models.Exercise.id)
+    ).scalars())
+    if deleted_names:
+        for column in tables.values():
+            db.execute(delete(column.table).where(column.in_(duplicates)))
+        version = bump_catalog_version(db)
+        db.commit()
+        invalidate_catalog(version)
     return deleted_names
 
 @app.post("/workouts/swap_exercise", response_model=schemas.Exercise)
-def swap_exercise(
+async def swap_exercise(
     current_workout_ids: list[int] = Body(...),
     swap_out_id: int = Body(...),
     muscle_groups: list[str] = Query(None),
     equipment: list[str] = Query(None),
     intensity_level: int = Query(3),
-    db: Session = Depends(get_db)
+    seed: Optional[int] = Query(None),
+    selection: str = Query("random"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Swap out an exercise in a workout for a new best-fit exercise."""
     try:
-        generator = WorkoutGenerator(db)
-        new_ex = generator.swap_exercise(
-            current_workout_ids=current_workout_ids,
-            swap_out_id=swap_out_id,
-            allowed_muscle_groups=muscle_groups,
-            allowed_equipment=equipment,
-            intensity_level=intensity_level
-        )
-        movement_types = get_exercise_movement_types(db, new_ex.id)
-        return schemas.Exercise(
-            id=new_ex.id,
-            name=new_ex.name,
-            description=new_ex.description,
-            movement_types=movement_types,
-            estimated_duration=new_ex.estimated_duration,
-            equipment=new_ex.equipment,
-            muscle_groups=new_ex.muscle_groups,
-            intensity=new_ex.intensity
-        )
+        catalog = await get_catalog_async(db)
+
+        def respond() -> bytes:
+            generator = WorkoutGenerator(catalog=catalog)
+            new_ex = generator.swap_exercise(
+                current_workout_ids=current_workout_ids,
+                swap_out_id=swap_out_id,
+                allowed_muscle_groups=muscle_groups,
+                allowed_equipment=equipment,
+                intensity_level=intensity_level,
+                seed=seed,
+                selection=selection
+            )
+            return exercise_fragment(new_ex, catalog.version)
+
+        return json_response(await run_in_threadpool(respond))
     except Exception as e:
         logger.error(f"Error in swap_exercise endpoint: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/workouts/reroll", response_model=schemas.Workout)
+async def reroll_workout(request: schemas.RerollRequest, db: AsyncSession = Depends(get_async_db)):
+    """Replace every unlocked exercise in a workout in one constraint-aware pass."""
+    try:
+        catalog = await get_catalog_async(db)
+
+        def respond() -> bytes:
+            generator = WorkoutGenerator(catalog=catalog)
+            workout = generator.reroll_workout(
+                current_workout_ids=request.current_workout_ids,
+                locked_ids=request.locked_ids,
+                allowed_muscle_groups=request.muscle_groups,
+                allowed_equipment=request.equipment,
+                intensity_level=request.intensity_level,
+                target_duration_minutes=request.target_duration_minutes,
+                rounds=request.rounds,
+                seed=request.seed
+            )
+            return workout_json(workout, catalog.version)
+
+        return json_response(await run_in_threadpool(respond))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in reroll_workout endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/workouts/superset", response_model=List[schemas.Exercise])
+async def generate_superset(
+    size: int = Query(5, ge=1),
+    seed: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Generate a superset of `size` exercises covering as many required movement types as fit, with as little muscle group overlap as possible."""
+    try:
+        catalog = await get_catalog_async(db)
+
+        def respond() -> bytes:
+            generator = WorkoutGenerator(catalog=catalog)
+            exercises = generator.generate_superset(size=size, seed=seed)
+            return json_array(exercise_fragment(ex, catalog.version) for ex in exercises)
+
+        return json_response(await run_in_threadpool(respond))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in generate_superset endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/timing")
+def read_timing():
+    """Whether phase timing is enabled, and the per-phase latency histograms collected so far."""
+    return {"enabled": timing.is_enabled(), "bucket_bounds_ms": timing.BUCKET_BOUNDS_MS, "phases": timing.histograms()}
+
+@app.post("/admin/timing")
+def update_timing(enabled: bool = Query(...), reset: bool = Query(False)):
+    """Turn phase timing on or off at runtime, optionally clearing the histograms."""
+    timing.set_enabled(enabled)
+    if reset:
+        timing.reset_histograms()
+    return {"enabled": timing.is_enabled()}
+
 # TEMPORARY: Admin endpoint to add intensity column to exercises table
 # REMOVE THIS ENDPOINT AFTER MIGRATION!
 @app.post("/admin/add_intensity_column")
@@ -0,0 +1,34 @@
+"""add_exercise_lookup_indexes
+
+Revision ID: 5c1e8f0a9d42
+Revises: 23749cfb7c53
+Create Date: 2026-10-17 05:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8f0a9d42'
+down_revision: Union[str, None] = '23749cfb7c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ASSOCIATION_TABLES = ['exercise_equipment', 'exercise_muscle_groups', 'exercise_movement_types']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_exercises_name', 'exercises', ['name'])
+    for table in ASSOCIATION_TABLES:
+        op.create_index(f'ix_{table}_exercise_id', table, ['exercise_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ASSOCIATION_TABLES:
+        op.drop_index(f'ix_{table}_exercise_id', table_name=table)
+    op.drop_index('ix_exercises_name', table_name='exercises')
@@ -42,21 +42,21 @@ class MuscleGroupType(enum.Enum):
 exercise_equipment = Table(
     'exercise_equipment',
     Base.metadata,
-    Column('exercise_id', Integer, ForeignKey('exercises.id')),
+    Column('exercise_id', Integer, ForeignKey('exercises.id'), index=True),
     Column('equipment_id', Integer, ForeignKey('equipment.id'))
 )
 
 exercise_muscle_groups = Table(
     'exercise_muscle_groups',
     Base.metadata,
-    Column('exercise_id', Integer, ForeignKey('exercises.id')),
+    Column('exercise_id', Integer, ForeignKey('exercises.id'), index=True),
     Column('muscle_group_id', Integer, ForeignKey('muscle_groups.id'))
 )
 
 exercise_movement_types = Table(
     'exercise_movement_types',
     Base.metadata,
-    Column('exercise_id', Integer, ForeignKey('exercises.id')),
+    Column('exercise_id', Integer, ForeignKey('exercises.id'), index=True),
     Column('movement_type', String)  # Store as string instead of Enum
 )
 
@@ -64,13 +64,27 @@ class Exercise(Base):
     __tablename__ = 'exercises'
 
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     description = Column(String)
     equipment = relationship("Equipment", secondary=exercise_equipment, back_populates="exercises")
     muscle_groups = relationship("MuscleGroup", secondary=exercise_muscle_groups, back_populates="exercises")
+    movement_type_links = relationship("ExerciseMovementType", viewonly=True)
     estimated_duration = Column(Integer)  # Duration in seconds
     intensity = Column(String, default='medium')  # 'low', 'medium', 'high'
 
+    @property
+    def movement_types(self):
+        """Movement types from the association table; eager-load movement_type_links to avoid a query per row."""
+        return [MovementType(link.movement_type) for link in self.movement_type_links]
+
+class ExerciseMovementType(Base):
+    # Read-only mapping of the association table so movement types can be
+    # loaded in bulk with selectinload(Exercise.movement_type_links)
+    __table__ = exercise_movement_types
+    __mapper_args__ = {
+        "primary_key": [exercise_movement_types.c.exercise_id, exercise_movement_types.c.movement_type]
+    }
+
 class Equipment(Base):
     __tablename__ = 'equipment'
 
@@ -83,4 +97,11 @@ class MuscleGroup(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(Enum(MuscleGroupType), nullable=False, unique=True)
-    exercises = relationship("Exercise", secondary=exercise_muscle_groups, back_populates="muscle_groups") 
\ No newline at end of file
+    exercises = relationship("Exercise", secondary=exercise_muscle_groups, back_populates="muscle_groups")
+
+class CatalogVersion(Base):
+    """Single row counting changes to the exercise tables, so every process can tell when its snapshot is stale."""
+    __tablename__ = 'catalog_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
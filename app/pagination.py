@@ -0,0 +1,24 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor encodes the id of the last row of a page; the next page starts after it.
+Clients should treat cursors as opaque strings and only pass them back.
+"""
+import base64
+import binascii
+import json
+
+def encode_cursor(last_id: int) -> str:
+    """Cursor for the page following the row with id `last_id`."""
+    payload = json.dumps({"after_id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Return the id a cursor continues after; raises ValueError for malformed cursors."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after_id = payload["after_id"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(after_id, int):
+        raise ValueError("Invalid cursor")
+    return after_id
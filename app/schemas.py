@@ -1,6 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from .models import MovementType, MuscleGroupType
+from .workout_generator import MAX_ROUNDS, MIN_ROUNDS
+
+# Longest workout the generation endpoints accept, in minutes
+MAX_DURATION_MINUTES = 240
+# Most workouts one batch request may generate
+MAX_BATCH_SIZE = 1000
 
 class EquipmentBase(BaseModel):
     name: str
@@ -50,4 +56,39 @@ class Exercise(ExerciseBase):
 class Workout(BaseModel):
     exercises: List[Exercise]
     rounds: int
-    estimated_duration_minutes: int 
\ No newline at end of file
+    estimated_duration_minutes: int
+    seed: Optional[int] = None  # pass back to /workouts/generate to replay this workout
+
+class WorkoutParameters(BaseModel):
+    duration_minutes: int = Field(..., ge=1, le=MAX_DURATION_MINUTES)
+    muscle_groups: Optional[List[str]] = None
+    equipment: Optional[List[str]] = None
+    intensity_level: int = 3
+    solver: str = "random"
+    seed: Optional[int] = None
+    selection: str = "random"
+
+class WorkoutBatchRequest(BaseModel):
+    # Either an explicit list of parameter sets, or one set repeated `count` times
+    workouts: List[WorkoutParameters] = []
+    params: Optional[WorkoutParameters] = None
+    count: int = Field(1, ge=1, le=MAX_BATCH_SIZE)
+
+class RerollRequest(BaseModel):
+    current_workout_ids: List[int]
+    locked_ids: List[int] = []
+    muscle_groups: Optional[List[str]] = None
+    equipment: Optional[List[str]] = None
+    intensity_level: int = 3
+    target_duration_minutes: Optional[int] = Field(None, ge=1, le=MAX_DURATION_MINUTES)
+    rounds: Optional[int] = Field(None, ge=MIN_ROUNDS, le=MAX_ROUNDS)
+    seed: Optional[int] = None
+
+class CleanupDryRun(BaseModel):
+    # What POST /exercises/cleanup?dry_run=true would delete: names and rows per table
+    dry_run: bool = True
+    duplicate_names: List[str]
+    equipment_links: int
+    muscle_group_links: int
+    movement_type_links: int
+    exercises: int
@@ -0,0 +1,141 @@
+"""Vectorized candidate scoring for quality-aware exercise selection.
+
+Each catalog snapshot gets a ScoringEngine holding per-exercise feature arrays
+(muscle group bits, duration, intensity code). A pick scores every candidate
+against the partial workout in one NumPy expression and samples from the
+softmax of the scores:
+
+    score = BALANCE_WEIGHT * share of the candidate's muscle groups the workout has not worked yet
+          + DURATION_WEIGHT * closeness of its duration to the target
+          + INTENSITY_WEIGHT * closeness of its intensity to the requested level
+
+NumPy is optional; without it `scoring_engine` raises and only random
+selection is available.
+"""
+from typing import Iterable, List, Optional
+from .catalog import ExerciseCatalog, MUSCLE_GROUP_BITS
+import random
+import weakref
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+SCORING_AVAILABLE = np is not None
+
+INTENSITY_CODES = {"low": 0.0, "medium": 1.0, "high": 2.0}
+BALANCE_WEIGHT = 1.0
+DURATION_WEIGHT = 1.0
+INTENSITY_WEIGHT = 0.5
+# Lower temperatures favour the best-scoring candidates more strongly
+TEMPERATURE = 0.2
+# Larger pools are scored on a uniform sample of this many exercises, drawn once per
+# workout, so the cost of a pick does not grow with the catalog
+MAX_POOL_SIZE = 1024
+
+def intensity_target(intensities: Iterable[str]) -> float:
+    """Intensity code to aim for given the intensities allowed at a level."""
+    codes = [INTENSITY_CODES.get(intensity, 1.0) for intensity in intensities]
+    return sum(codes) / len(codes) if codes else 1.0
+
+class ScoringEngine:
+    """Feature arrays for one catalog snapshot, indexed like ExerciseCatalog.all_exercises."""
+
+    def __init__(self, catalog: ExerciseCatalog):
+        exercises = catalog.all_exercises
+        self.size = len(exercises)
+        self._mask_bytes = (self.size + 7) // 8
+        muscle_masks = np.array([ex.muscle_mask for ex in exercises], dtype=np.int64)
+        self.muscles = ((muscle_masks[:, None] >> np.arange(len(MUSCLE_GROUP_BITS))) & 1).astype(np.float32)
+        self.muscle_counts = np.maximum(self.muscles.sum(axis=1), 1.0)
+        self.durations = np.array([ex.estimated_duration or 0 for ex in exercises], dtype=np.float32)
+        self.intensities = np.array([INTENSITY_CODES.get(ex.intensity, 1.0) for ex in exercises], dtype=np.float32)
+
+    def members(self, mask: int) -> "np.ndarray":
+        """Catalog indices of the set bits of a bitset."""
+        return np.flatnonzero(self.flags(mask))
+
+    def flags(self, mask: int) -> "np.ndarray":
+        """Bitset as a boolean-valued uint8 array over the catalog."""
+        raw = np.frombuffer(mask.to_bytes(self._mask_bytes, "little"), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder="little")[:self.size]
+
+    def pool(self, mask: int, target_intensity: float, rng: Optional[random.Random] = None) -> "PoolScorer":
+        """Scorer restricted to the exercises of a candidate pool, sampled down to MAX_POOL_SIZE if `rng` is given."""
+        indices = self.members(mask)
+        if rng is not None and len(indices) > MAX_POOL_SIZE:
+            sample = np.random.default_rng(rng.getrandbits(64)).choice(len(indices), MAX_POOL_SIZE, replace=False)
+            indices = np.sort(indices[sample])
+        return PoolScorer(self, indices, target_intensity)
+
+    def pick(self, mask: int, selected: List[int], target_duration: Optional[float], target_intensity: float,
+             rng: random.Random = random) -> int:
+        """Sample a catalog index from a non-empty candidate bitset; see PoolScorer.pick."""
+        return self.pool(mask, target_intensity).pick(mask, selected, target_duration, rng)
+
+class PoolScorer:
+    """Features of one candidate pool, gathered once so each pick only scores the pool.
+
+    Scores are kept pre-divided by TEMPERATURE. Every term is bounded, so they can be
+    exponentiated directly without overflow.
+    """
+
+    def __init__(self, engine: ScoringEngine, indices: "np.ndarray", target_intensity: float):
+        self.engine = engine
+        self.indices = indices
+        self.target_intensity = target_intensity
+        # Balance is a dot product with the workout's per-muscle novelty, normalised by muscle count
+        self.balance_weights = engine.muscles[indices] * (BALANCE_WEIGHT / TEMPERATURE / engine.muscle_counts[indices])[:, None]
+        self.durations = engine.durations[indices]
+        self.base_scores = (INTENSITY_WEIGHT / TEMPERATURE) * (
+            1.0 - np.abs(engine.intensities[indices] - target_intensity) / 2.0
+        )
+        self._target_duration = None
+        self._static_scores = self.base_scores
+
+    def _scores_for(self, target_duration: Optional[float]) -> "np.ndarray":
+        # Picks for one (exercises, rounds) pair share a target duration, so the duration term is reused
+        if target_duration != self._target_duration:
+            self._target_duration = target_duration
+            self._static_scores = self.base_scores
+            if target_duration is not None:
+                target = max(target_duration, 1.0)
+                self._static_scores = self.base_scores + (DURATION_WEIGHT / TEMPERATURE) * (
+                    1.0 - np.minimum(np.abs(self.durations - target) / target, 1.0)
+                )
+        return self._static_scores
+
+    def scores(self, selected: List[int], target_duration: Optional[float]) -> "np.ndarray":
+        """Score every pool exercise against the exercises already selected, divided by TEMPERATURE."""
+        muscles = self.engine.muscles
+        coverage = muscles[selected].sum(axis=0) if selected else np.zeros(muscles.shape[1], dtype=np.float32)
+        return self._scores_for(target_duration) + self.balance_weights @ (1.0 / (1.0 + coverage))
+
+    def pick(self, mask: int, selected: List[int], target_duration: Optional[float],
+             rng: random.Random = random) -> int:
+        """Sample a catalog index from the pool members in `mask` with softmax(score / TEMPERATURE).
+
+        `mask` must be non-empty and should be a subset of the pool; if none of its
+        members were sampled into the pool they are scored directly. The draw uses
+        `rng`, so seeded generation stays reproducible.
+        """
+        allowed = self.engine.flags(mask)[self.indices]
+        if not allowed.any():
+            return self.engine.pick(mask, selected, target_duration, self.target_intensity, rng)
+        cumulative = np.cumsum(np.exp(self.scores(selected, target_duration)) * allowed)
+        position = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))
+        return int(self.indices[min(position, len(self.indices) - 1)])
+
+# One engine per catalog snapshot, dropped with the snapshot
+_engines: "weakref.WeakKeyDictionary[ExerciseCatalog, ScoringEngine]" = weakref.WeakKeyDictionary()
+
+def scoring_engine(catalog: ExerciseCatalog) -> ScoringEngine:
+    """Return the scoring engine for a catalog snapshot, building it on first use."""
+    if not SCORING_AVAILABLE:
+        raise ValueError("Scored selection requires numpy; install it or use selection=random")
+    engine = _engines.get(catalog)
+    if engine is None:
+        engine = ScoringEngine(catalog)
+        _engines[catalog] = engine
+    return engine
@@ -4,6 +4,7 @@ from app.database import get_db
 from sqlalchemy.orm import Session
 from fastapi import Depends
 from app import models
+from app.catalog import bump_catalog_version
 
 def list_valid_muscle_groups():
     """Print all valid muscle groups for reference."""
@@ -570,6 +571,8 @@ def seed_exercises(db: Session):
 
         added_exercises.append(exercise_data["name"])
 
+    # Lets running API processes notice the change, including when seeding from the command line
+    bump_catalog_version(db)
     db.commit()
     
     # Return summary of what was added and skipped
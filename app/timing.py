@@ -0,0 +1,151 @@
+"""Per-phase request timing.
+
+Code marks its stages with `with phase("name"):`. While timing is enabled
+ServerTimingMiddleware starts a timing context per request, reports the
+recorded phases in a `Server-Timing` response header and adds them to
+process-wide per-phase histograms. While disabled, `phase` returns a shared
+no-op context manager and the middleware passes requests straight through.
+
+Enable with PHASE_TIMING=1 or at runtime through POST /admin/timing.
+"""
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds of the histogram buckets in milliseconds; the last bucket is unbounded
+BUCKET_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+_enabled = os.environ.get("PHASE_TIMING", "").lower() in ("1", "true", "yes")
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("phase_timings", default=None)
+
+class _Phase:
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str, timings: List[Tuple[str, float]]):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timings.append((self.name, (time.perf_counter() - self.start) * 1000))
+        return False
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_PHASE = _NoPhase()
+
+def phase(name: str):
+    """Context manager timing a stage of the current request, or a no-op when timing is off."""
+    if not _enabled:
+        return _NO_PHASE
+    timings = _timings.get()
+    if timings is None:
+        return _NO_PHASE
+    return _Phase(name, timings)
+
+def is_enabled() -> bool:
+    return _enabled
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format phases as a Server-Timing header value, summing repeated phases."""
+    totals: Dict[str, float] = {}
+    for name, duration_ms in timings:
+        totals[name] = totals.get(name, 0.0) + duration_ms
+    return ", ".join(f"{name};dur={duration_ms:.3f}" for name, duration_ms in totals.items())
+
+class ServerTimingMiddleware:
+    """ASGI middleware reporting a request's phases, plus its total, in a Server-Timing header.
+
+    A plain ASGI middleware rather than @app.middleware("http"): while timing is
+    disabled it hands the request straight to the app, so it costs one check.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not _enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            # Streaming responses may start from another task, so the phases are read
+            # from the list itself rather than the context variable
+            if message["type"] == "http.response.start":
+                phases = timings + [("total", (time.perf_counter() - start) * 1000)]
+                for name, duration_ms in phases:
+                    _histograms.record(name, duration_ms)
+                header = server_timing_header(phases).encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+
+class PhaseHistograms:
+    """Thread-safe fixed-bucket latency histograms, one per phase name."""
+
+    def __init__(self, bounds_ms: List[float] = BUCKET_BOUNDS_MS):
+        self.bounds_ms = bounds_ms
+        self._phases: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration_ms: float) -> None:
+        bucket = bisect.bisect_left(self.bounds_ms, duration_ms)
+        with self._lock:
+            histogram = self._phases.get(name)
+            if histogram is None:
+                histogram = {"count": 0, "sum_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(self.bounds_ms) + 1)}
+                self._phases[name] = histogram
+            histogram["count"] += 1
+            histogram["sum_ms"] += duration_ms
+            histogram["max_ms"] = max(histogram["max_ms"], duration_ms)
+            histogram["buckets"][bucket] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Copy of every histogram with its buckets keyed by upper bound ("+Inf" for the last)."""
+        labels = [str(bound) for bound in self.bounds_ms] + ["+Inf"]
+        with self._lock:
+            return {
+                name: {
+                    "count": histogram["count"],
+                    "mean_ms": histogram["sum_ms"] / histogram["count"],
+                    "max_ms": histogram["max_ms"],
+                    "buckets": dict(zip(labels, histogram["buckets"])),
+                }
+                for name, histogram in self._phases.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._phases.clear()
+
+_histograms = PhaseHistograms()
+
+def histograms() -> Dict[str, dict]:
+    return _histograms.snapshot()
+
+def reset_histograms() -> None:
+    _histograms.clear()
@@ -1,17 +1,62 @@
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Optional, Tuple
 from sqlalchemy.orm import Session
-from . import models
+from .catalog import ExerciseCatalog, ExerciseRecord, get_catalog, muscle_group_mask, random_bit
 from .models import MovementType, MuscleGroupType
+from .cache import LRUCache
+from .timing import phase
+from .scoring import ScoringEngine, intensity_target, scoring_engine
 import random
 import logging
+import os
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+WARM_UP_SECONDS = 5 * 60  # 5 minutes of warm-up and stretching
+REST_BETWEEN_EXERCISES_SECONDS = 30
+REST_BETWEEN_ROUNDS_SECONDS = 90  # 1.5 minutes between rounds
+
+MIN_EXERCISES = 3
+MAX_EXERCISES = 10
+MIN_ROUNDS = 1
+MAX_ROUNDS = 4
+
+INTENSITY_MAP = {
+    1: ["low"],
+    2: ["low", "medium"],
+    3: ["medium"],
+    4: ["medium", "high"],
+    5: ["high"]
+}
+
+# "random" samples one selection per (exercises, rounds) pair; "exact" solves
+# the duration fit as a bounded subset-sum over estimated durations
+SOLVERS = ("random", "exact")
+# How the random solver and swaps pick among candidates: uniformly, or by sampling
+# from the softmax of quality scores (see app/scoring.py; needs numpy)
+SELECTIONS = ("random", "scored")
+
+# Seeded workouts are a pure function of (parameters, seed, catalog version), so
+# they can be cached and replayed
+workout_cache = LRUCache(
+    maxsize=int(os.environ.get("WORKOUT_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("WORKOUT_CACHE_TTL_SECONDS", "3600"))
+)
+
+def filter_signature(allowed_muscle_groups: Optional[list[str]], allowed_equipment: Optional[list[str]],
+                     intensity_level: int) -> tuple:
+    """Order-insensitive key for a combination of filters."""
+    return (
+        tuple(sorted(allowed_muscle_groups)) if allowed_muscle_groups else None,
+        tuple(sorted(allowed_equipment)) if allowed_equipment else None,
+        intensity_level
+    )
+
 class WorkoutGenerator:
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Session] = None, catalog: Optional[ExerciseCatalog] = None):
         self.db = db
+        self.catalog = catalog if catalog is not None else get_catalog(db)
         self.required_movement_types = {
             MovementType.PUSH,
             MovementType.PULL,
@@ -22,233 +67,476 @@ class WorkoutGenerator:
         }
         self.core_movement_types = {MovementType.CORE, MovementType.TWIST}
         
-    def get_exercises_by_movement_type(self, movement_type: MovementType) -> List[models.Exercise]:
+    def get_exercises_by_movement_type(self, movement_type: MovementType) -> List[ExerciseRecord]:
         """Get all exercises of a specific movement type."""
-        # Get all exercise IDs that have this movement type
-        stmt = models.exercise_movement_types.select().where(
-            models.exercise_movement_types.c.movement_type == movement_type.value
-        )
-        result = self.db.execute(stmt)
-        exercise_ids = [row[0] for row in result]
-        
-        if not exercise_ids:
-            return []
-            
-        # Get the full exercise objects
-        return self.db.query(models.Exercise).filter(models.Exercise.id.in_(exercise_ids)).all()
+        return list(self.catalog.by_movement_type[movement_type])
     
-    def get_exercises_by_movement_types(self, movement_types: Set[MovementType]) -> List[models.Exercise]:
+    def get_exercises_by_movement_types(self, movement_types: Set[MovementType]) -> List[ExerciseRecord]:
         """Get all exercises that match any of the given movement types."""
         exercises = []
         for movement_type in movement_types:
             exercises.extend(self.get_exercises_by_movement_type(movement_type))
         return exercises
     
-    def get_muscle_groups(self, exercise: models.Exercise) -> Set[MuscleGroupType]:
+    def get_muscle_groups(self, exercise: ExerciseRecord) -> Set[MuscleGroupType]:
         """Get all muscle groups targeted by an exercise."""
         return {mg.name for mg in exercise.muscle_groups}
     
-    def has_overlapping_muscle_groups(self, exercise1: models.Exercise, exercise2: models.Exercise) -> bool:
+    def has_overlapping_muscle_groups(self, exercise1: ExerciseRecord, exercise2: ExerciseRecord) -> bool:
         """Check if two exercises target any of the same muscle groups."""
-        muscle_groups1 = self.get_muscle_groups(exercise1)
-        muscle_groups2 = self.get_muscle_groups(exercise2)
-        return bool(muscle_groups1.intersection(muscle_groups2))
+        return bool(exercise1.muscle_mask & exercise2.muscle_mask)
     
-    def get_movement_types(self, exercise: models.Exercise) -> Set[MovementType]:
+    def get_movement_types(self, exercise: ExerciseRecord) -> Set[MovementType]:
         """Get all movement types for an exercise."""
-        stmt = models.exercise_movement_types.select().where(
-            models.exercise_movement_types.c.exercise_id == exercise.id
-        )
-        result = self.db.execute(stmt)
-        return {MovementType(mt[1]) for mt in result}
+        return set(exercise.movement_types)
     
-    def are_exercises_similar(self, exercise1: models.Exercise, exercise2: models.Exercise) -> bool:
+    def are_exercises_similar(self, exercise1: ExerciseRecord, exercise2: ExerciseRecord) -> bool:
         """Check if two exercises are too similar to be done in sequence."""
-        # Get movement types and muscle groups
-        movement_types1 = self.get_movement_types(exercise1)
-        movement_types2 = self.get_movement_types(exercise2)
-        muscle_groups1 = self.get_muscle_groups(exercise1)
-        muscle_groups2 = self.get_muscle_groups(exercise2)
-        
-        # Check for movement type overlap
-        movement_overlap = bool(movement_types1.intersection(movement_types2))
-        
-        # Check for significant muscle group overlap (more than 50% of muscle groups)
-        common_muscle_groups = muscle_groups1.intersection(muscle_groups2)
-        total_muscle_groups = muscle_groups1.union(muscle_groups2)
-        muscle_overlap_ratio = len(common_muscle_groups) / len(total_muscle_groups)
+        # Exercises are similar if they share movement types...
+        if exercise1.movement_mask & exercise2.movement_mask:
+            return True
         
-        # Exercises are similar if they share movement types or have significant muscle group overlap
-        return movement_overlap or muscle_overlap_ratio > 0.5
+        # ...or have significant muscle group overlap (more than 50% of muscle groups)
+        common_count = (exercise1.muscle_mask & exercise2.muscle_mask).bit_count()
+        total_count = (exercise1.muscle_mask | exercise2.muscle_mask).bit_count()
+        return common_count * 2 > total_count
     
     def select_exercise_for_movement_type(self, movement_type: MovementType, 
-                                        excluded_exercises: Set[models.Exercise],
-                                        previous_exercise: Optional[models.Exercise] = None) -> models.Exercise:
+                                        excluded_exercises: Set[ExerciseRecord],
+                                        previous_exercise: Optional[ExerciseRecord] = None,
+                                        rng: random.Random = random) -> ExerciseRecord:
         """Select a random exercise for a movement type, excluding already selected exercises and similar exercises."""
-        available_exercises = [ex for ex in self.get_exercises_by_movement_type(movement_type)
-                             if ex not in excluded_exercises]
+        catalog = self.catalog
+        excluded_mask = catalog.mask_of(excluded_exercises)
+        available = catalog.with_movement_type(movement_type) & ~excluded_mask
         
-        if not available_exercises:
+        if not available:
             # If no exercises found for this movement type, try core movement types
             if movement_type in self.core_movement_types:
-                core_exercises = []
                 for core_type in self.core_movement_types:
-                    core_exercises.extend(self.get_exercises_by_movement_type(core_type))
-                available_exercises = [ex for ex in core_exercises if ex not in excluded_exercises]
+                    available |= catalog.with_movement_type(core_type)
+                available &= ~excluded_mask
             
-            if not available_exercises:
+            if not available:
                 raise ValueError(f"No available exercises for movement type {movement_type}")
         
         # If there's a previous exercise, filter out similar ones
         if previous_exercise:
-            available_exercises = [ex for ex in available_exercises 
-                                 if not self.are_exercises_similar(ex, previous_exercise)]
+            dissimilar = available & ~catalog.similarity_row(previous_exercise)
             
             # If we filtered out all exercises, fall back to the original list
-            if not available_exercises:
-                available_exercises = [ex for ex in self.get_exercises_by_movement_type(movement_type)
-                                     if ex not in excluded_exercises]
+            if not dissimilar:
+                dissimilar = catalog.with_movement_type(movement_type) & ~excluded_mask
+            available = dissimilar or available
                 
-        return random.choice(available_exercises)
+        return catalog.all_exercises[random_bit(available, rng)]
     
-    def generate_superset(self, size: int = 5) -> List[models.Exercise]:
-        """Generate a superset of exercises that target different muscle groups."""
-        selected_exercises = set()
+    def generate_superset(self, size: int = 5, seed: Optional[int] = None) -> List[ExerciseRecord]:
+        """Generate a superset of exercises that target different muscle groups.
         
-        # First, ensure we have one of each required movement type
-        for movement_type in self.required_movement_types:
-            try:
-                exercise = self.select_exercise_for_movement_type(movement_type, selected_exercises)
-                selected_exercises.add(exercise)
-            except ValueError as e:
+        Exercises are nodes of a conflict graph whose edges join exercises sharing a
+        muscle group. One exercise is drawn from each required movement type bucket,
+        preferring ones that do not conflict with earlier picks, until `size` is
+        reached (so smaller supersets cover the types in declaration order), and the
+        superset is then grown greedily into an independent set: every further pick comes from
+        the bitset of exercises outside the union of the conflict rows so far.
+        """
+        catalog = self.catalog
+        rng = random.Random(seed) if seed is not None else random
+        selected: List[ExerciseRecord] = []
+        selected_mask = 0
+        conflicts = 0
+        
+        # First, ensure we have one of each required movement type (in declaration order, so seeds replay)
+        for movement_type in MovementType:
+            if len(selected) >= size:
+                break
+            if movement_type not in self.required_movement_types:
+                continue
+            available = catalog.with_movement_type(movement_type) & ~selected_mask
+            if not available and movement_type in self.core_movement_types:
+                for core_type in self.core_movement_types:
+                    available |= catalog.with_movement_type(core_type)
+                available &= ~selected_mask
+            if not available:
                 # If we can't find an exercise for a specific movement type, skip it
                 # (this should only happen for CORE/TWIST since they're interchangeable)
                 if movement_type not in self.core_movement_types:
-                    raise e
+                    raise ValueError(f"No available exercises for movement type {movement_type}")
                 continue
+            exercise = catalog.all_exercises[random_bit(available & ~conflicts or available, rng)]
+            selected.append(exercise)
+            selected_mask |= 1 << exercise.index
+            conflicts |= catalog.conflict_row(exercise)
         
         # If we need more exercises, add them while avoiding muscle group overlap
-        while len(selected_exercises) < size:
-            all_exercises = self.db.query(models.Exercise).all()
-            available_exercises = [ex for ex in all_exercises 
-                                 if ex not in selected_exercises and
-                                 not any(self.has_overlapping_muscle_groups(ex, selected) 
-                                       for selected in selected_exercises)]
-            
-            if not available_exercises:
+        while len(selected) < size:
+            available = catalog.unique_mask & ~selected_mask & ~conflicts
+            if not available:
                 break  # Can't add more exercises without overlap
-                
-            selected_exercises.add(random.choice(available_exercises))
+            exercise = catalog.all_exercises[random_bit(available, rng)]
+            selected.append(exercise)
+            selected_mask |= 1 << exercise.index
+            conflicts |= catalog.conflict_row(exercise)
         
-        return list(selected_exercises)
+        return selected
     
-    def calculate_workout_duration(self, exercises: List[models.Exercise], 
+    def calculate_workout_duration(self, exercises: List[ExerciseRecord], 
                                  rounds: int = 2) -> int:
         """Calculate total workout duration in seconds."""
         # Warm-up and stretching
-        total_duration = 5 * 60  # 5 minutes
+        total_duration = WARM_UP_SECONDS
         
         # Exercise duration
         for exercise in exercises:
             # Exercise duration + rest between exercises
-            total_duration += (exercise.estimated_duration + 30) * rounds
+            total_duration += (exercise.estimated_duration + REST_BETWEEN_EXERCISES_SECONDS) * rounds
         
         # Rest between rounds
-        total_duration += 90 * (rounds - 1)  # 1.5 minutes between rounds
+        total_duration += REST_BETWEEN_ROUNDS_SECONDS * (rounds - 1)
         
         return total_duration
     
-    def is_frontal_or_transverse(self, exercise: models.Exercise) -> bool:
+    def is_frontal_or_transverse(self, exercise: ExerciseRecord) -> bool:
         """Return True if exercise is frontal or transverse plane (TWIST or targets side_deltoids, adductors, abductors)."""
-        movement_types = self.get_movement_types(exercise)
-        muscle_groups = self.get_muscle_groups(exercise)
-        if MovementType.TWIST in movement_types:
-            return True
-        frontal_mgs = {MuscleGroupType.SIDE_DELTOIDS, MuscleGroupType.ADDUCTORS, MuscleGroupType.ABDUCTORS}
-        return bool(frontal_mgs.intersection(muscle_groups))
+        return exercise.is_frontal_or_transverse
 
-    def generate_workout(self, duration_minutes: int, allowed_muscle_groups: list[str] = None, allowed_equipment: list[str] = None, intensity_level: int = 3) -> Dict:
-        """Generate a workout with the specified duration in minutes, optionally filtering by allowed muscle groups, equipment, and intensity level (1-5)."""
-        try:
-            logger.info(f"Starting workout generation with params: duration={duration_minutes}, muscle_groups={allowed_muscle_groups}, equipment={allowed_equipment}, intensity_level={intensity_level}")
-            
-            INTENSITY_MAP = {
-                1: ["low"],
-                2: ["low", "medium"],
-                3: ["medium"],
-                4: ["medium", "high"],
-                5: ["high"]
-            }
-            allowed_intensities = INTENSITY_MAP.get(intensity_level, ["medium"])
-            
-            exercises = self.db.query(models.Exercise).all()
-            if not exercises:
-                raise ValueError("No exercises available in the database")
-            
-            logger.info(f"Found {len(exercises)} total exercises")
-
-            # Deduplicate exercises by name
-            unique_exercises = {}
-            for ex in exercises:
-                if ex.name not in unique_exercises:
-                    unique_exercises[ex.name] = ex
-            exercises = list(unique_exercises.values())
-            logger.info(f"After deduplication: {len(exercises)} exercises")
-
-            # Store original exercises for fallback
-            original_exercises = exercises.copy()
-
-            # Filter by allowed muscle groups if provided
-            if allowed_muscle_groups:
-                allowed_mg_set = set(allowed_muscle_groups)
-                def is_allowed_by_mg(ex):
-                    ex_mgs = {mg.name for mg in ex.muscle_groups}
-                    return ex_mgs.issubset(allowed_mg_set)
-                filtered_exercises = list(filter(is_allowed_by_mg, exercises))
-                if filtered_exercises:
-                    exercises = filtered_exercises
-                    logger.info(f"After muscle group filtering: {len(exercises)} exercises")
-
-            # Filter by allowed equipment if provided
-            if allowed_equipment:
-                allowed_equip_set = set(allowed_equipment)
-                def is_allowed_by_equip(ex):
-                    ex_equip = {e.name for e in ex.equipment}
-                    return bool(ex_equip.intersection(allowed_equip_set))
-                filtered_exercises = list(filter(is_allowed_by_equip, exercises))
-                if filtered_exercises:
-                    exercises = filtered_exercises
-                    logger.info(f"After equipment filtering: {len(exercises)} exercises")
-
-            # Filter by allowed intensities
-            filtered_exercises = [ex for ex in exercises if (getattr(ex, 'intensity', None) or 'medium') in allowed_intensities]
-            if filtered_exercises:
-                exercises = filtered_exercises
-                logger.info(f"After intensity_level filtering: {len(exercises)} exercises")
+    def order_exercises(self, exercises: List[ExerciseRecord], rng: random.Random = random) -> Optional[List[ExerciseRecord]]:
+        """Order exercises so that no two similar exercises are adjacent, or return None if that is impossible."""
+        count = len(exercises)
+        # follows[i]: bitset of local positions allowed directly after exercise i
+        follows = []
+        for ex in exercises:
+            row = self.catalog.similarity_row(ex)
+            follows.append(sum(1 << j for j, other in enumerate(exercises) if not (row >> other.index) & 1))
+        failed = set()
+        order = []
+
+        def extend(last: int, remaining: int) -> bool:
+            if not remaining:
+                return True
+            if (last, remaining) in failed:
+                return False
+            options = [j for j in range(count) if (remaining >> j) & 1 and (last < 0 or (follows[last] >> j) & 1)]
+            rng.shuffle(options)
+            for j in options:
+                order.append(j)
+                if extend(j, remaining & ~(1 << j)):
+                    return True
+                order.pop()
+            failed.add((last, remaining))
+            return False
+
+        if not extend(-1, (1 << count) - 1):
+            return None
+        return [exercises[j] for j in order]
+
+    def _search_random_config(self, pool_mask: int, frontal_transverse_exercises: List[ExerciseRecord],
+                              required_count: int, target_seconds: int,
+                              rng: random.Random = random, engine: Optional[ScoringEngine] = None,
+                              target_intensity: float = 1.0) -> Optional[Tuple[List[ExerciseRecord], int, int]]:
+        """Draw one random selection per (exercises, rounds) pair from the pool bitset and keep the closest fit.
+
+        With a scoring engine each pick is sampled by score, aiming at the per-exercise
+        duration that would make the pair hit the target exactly.
+        """
+        pool_size = pool_mask.bit_count()
+        max_exercises = min(MAX_EXERCISES, pool_size)
+        best_config = None
+        best_diff = float('inf')
+        scorer = engine.pool(pool_mask, target_intensity, rng) if engine is not None else None
+
+        # Try different combinations of exercises and rounds
+        for num_exercises in range(MIN_EXERCISES, max_exercises + 1):
+            for num_rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+                if num_exercises > pool_size:
+                    continue
+                # Select exercises ensuring no similar exercises are adjacent
+                selected = []
+                available = pool_mask
+                previous_exercise = None
+                if scorer is not None:
+                    ideal_duration = ((target_seconds - WARM_UP_SECONDS - REST_BETWEEN_ROUNDS_SECONDS * (num_rounds - 1))
+                                      / (num_exercises * num_rounds) - REST_BETWEEN_EXERCISES_SECONDS)
+                while len(selected) < num_exercises and available:
+                    candidates = available
+                    if previous_exercise:
+                        candidates = available & ~self.catalog.similarity_row(previous_exercise)
+                    if not candidates:
+                        candidates = available
+                    if scorer is None:
+                        exercise = self.catalog.all_exercises[random_bit(candidates, rng)]
+                    else:
+                        exercise = self.catalog.all_exercises[scorer.pick(
+                            candidates, [ex.index for ex in selected], ideal_duration, rng
+                        )]
+                    selected.append(exercise)
+                    available &= ~(1 << exercise.index)
+                    previous_exercise = exercise
+                if len(selected) < num_exercises:
+                    continue
+                # Ensure required number of frontal/transverse exercises
+                ft_count = sum(1 for ex in selected if self.is_frontal_or_transverse(ex))
+                if ft_count < required_count and len(frontal_transverse_exercises) >= required_count:
+                    # Replace random exercises with frontal/transverse ones
+                    to_add = required_count - ft_count
+                    # Find which ones are missing
+                    missing = [ex for ex in frontal_transverse_exercises if ex not in selected]
+                    if len(missing) >= to_add:
+                        # Replace random non-frontal/transverse exercises
+                        non_ft_indices = [i for i, ex in enumerate(selected) if not self.is_frontal_or_transverse(ex)]
+                        for i in non_ft_indices[:to_add]:
+                            selected[i] = missing.pop()
+                # Recount after replacement
+                ft_count = sum(1 for ex in selected if self.is_frontal_or_transverse(ex))
+                if ft_count < required_count:
+                    continue  # Skip this config if we can't meet the requirement
+                total_seconds = self.calculate_workout_duration(selected, num_rounds)
+                diff = abs(total_seconds - target_seconds)
+                if diff < best_diff:
+                    best_diff = diff
+                    best_config = (selected, num_rounds, total_seconds)
+                if diff == 0:
+                    break
+        return best_config
+
+    def _exact_sums(self, exercises: List[ExerciseRecord], required_count: int) -> Tuple[Dict, List, List, Dict]:
+        """Run the subset-sum DP of _search_exact_config and return (groups, group keys, snapshots, plans).
+
+        Exercises with the same duration and plane are interchangeable, so the DP runs
+        over those groups: reach[k][f] is a bitset of the duration sums reachable with
+        k exercises, f of them frontal/transverse (capped at required_count), and
+        snapshots[i] is reach before group i was added (the last one is the final reach).
+        None of it depends on the target, so callers can reuse the result; `plans`
+        memoises the group counts chosen per target duration.
+        """
+        max_exercises = min(MAX_EXERCISES, len(exercises))
+        groups: Dict[Tuple[int, bool], List[ExerciseRecord]] = {}
+        for ex in exercises:
+            groups.setdefault((ex.estimated_duration, ex.is_frontal_or_transverse), []).append(ex)
+        group_keys = sorted(groups)
+
+        reach = [[0] * (required_count + 1) for _ in range(max_exercises + 1)]
+        reach[0][0] = 1
+        snapshots = [reach]
+        for duration, is_ft in group_keys:
+            reach = [row[:] for row in reach]
+            # Add one exercise of this group per pass, up to the group size
+            for _ in range(min(len(groups[(duration, is_ft)]), max_exercises)):
+                for k in range(max_exercises - 1, -1, -1):
+                    for f in range(required_count + 1):
+                        if reach[k][f]:
+                            reach[k + 1][min(f + is_ft, required_count)] |= reach[k][f] << duration
+            snapshots.append(reach)
+        return groups, group_keys, snapshots, {}
+
+    def _exact_plan(self, groups: Dict, group_keys: List, snapshots: List, required_count: int,
+                    target_seconds: int) -> Optional[Tuple[List[Tuple[Tuple[int, bool], int]], int, int]]:
+        """Return (exercises to take per group, rounds, total seconds) for the duration closest to the target."""
+        reach = snapshots[-1]
+        max_exercises = len(reach) - 1
+
+        # Pick the closest reachable sum for every (exercises, rounds) pair
+        best = None
+        best_diff = float('inf')
+        for num_exercises in range(MIN_EXERCISES, max_exercises + 1):
+            sums = reach[num_exercises][required_count]
+            if not sums:
+                continue
+            for num_rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+                fixed_seconds = self.calculate_workout_duration([], num_rounds) + REST_BETWEEN_EXERCISES_SECONDS * num_exercises * num_rounds
+                # No reachable sum exceeds sums.bit_length(), so larger targets need no wider masks
+                ideal_sum = min(max(0, (target_seconds - fixed_seconds) // num_rounds), sums.bit_length())
+                below = (sums & ((1 << (ideal_sum + 1)) - 1)).bit_length() - 1
+                above_bits = sums >> ideal_sum
+                above = ideal_sum + (above_bits & -above_bits).bit_length() - 1 if above_bits else -1
+                for duration_sum in (below, above):
+                    if duration_sum < 0:
+                        continue
+                    total_seconds = fixed_seconds + duration_sum * num_rounds
+                    diff = abs(total_seconds - target_seconds)
+                    if diff < best_diff:
+                        best_diff = diff
+                        best = (num_exercises, num_rounds, duration_sum, total_seconds)
+        if best is None:
+            return None
+
+        # Walk the snapshots backwards to recover how many exercises to take from each group
+        num_exercises, num_rounds, duration_sum, total_seconds = best
+        counts = []
+        k, f, remaining_sum = num_exercises, required_count, duration_sum
+        for i in range(len(group_keys) - 1, -1, -1):
+            duration, is_ft = group_keys[i]
+            before = snapshots[i]
+            found = False
+            for take in range(min(len(groups[group_keys[i]]), k) + 1):
+                previous_sum = remaining_sum - take * duration
+                if previous_sum < 0:
+                    break
+                for previous_f in range(required_count + 1):
+                    if min(previous_f + take * is_ft, required_count) == f and (before[k - take][previous_f] >> previous_sum) & 1:
+                        found = True
+                        break
+                if found:
+                    break
+            if take:
+                counts.append((group_keys[i], take))
+            k, f, remaining_sum = k - take, previous_f, previous_sum
+        return counts, num_rounds, total_seconds
+
+    def _search_exact_config(self, exercises: List[ExerciseRecord], required_count: int, target_seconds: int,
+                             rng: random.Random = random,
+                             tables: Optional[Tuple[Dict, List, List, Dict]] = None) -> Optional[Tuple[List[ExerciseRecord], int, int]]:
+        """Find the (exercises, rounds) combination whose duration is closest to the target.
+
+        For a fixed number of exercises and rounds the duration only depends on the
+        sum of estimated durations, so this is a bounded subset-sum (see _exact_sums;
+        pass its result for these exercises as `tables` to skip recomputing it).
+        """
+        max_exercises = min(MAX_EXERCISES, len(exercises))
+        if max_exercises < MIN_EXERCISES:
+            return None
+        groups, group_keys, snapshots, plans = tables if tables is not None else self._exact_sums(exercises, required_count)
+        if target_seconds not in plans:
+            plans[target_seconds] = self._exact_plan(groups, group_keys, snapshots, required_count, target_seconds)
+        plan = plans[target_seconds]
+        if plan is None:
+            return None
+        counts, num_rounds, total_seconds = plan
+
+        # Draw the members, retrying a few times if they cannot be ordered without similar neighbours
+        for _ in range(5):
+            selected = []
+            for key, take in counts:
+                selected.extend(rng.sample(groups[key], take))
+            ordered = self.order_exercises(selected, rng)
+            if ordered is not None:
+                return ordered, num_rounds, total_seconds
+        rng.shuffle(selected)
+        return selected, num_rounds, total_seconds
+
+    def _filter_mask(self, allowed_muscle_groups: Optional[list[str]], allowed_equipment: Optional[list[str]],
+                     intensity_level: int) -> int:
+        """Apply the muscle group, equipment and intensity filters in turn using the catalog's inverted indexes.
+
+        Each filter is skipped if it would leave no exercises. Results are cached on the
+        catalog per filter signature.
+        """
+        catalog = self.catalog
+        key = ("filter", filter_signature(allowed_muscle_groups, allowed_equipment, intensity_level))
+        mask = catalog.pool_cache.get(key)
+        if mask is not None:
+            return mask
+        mask = catalog.unique_mask
+
+        # Filter by allowed muscle groups if provided
+        if allowed_muscle_groups:
+            filtered = mask & catalog.with_only_muscle_groups(muscle_group_mask(allowed_muscle_groups))
+            if filtered:
+                mask = filtered
+                logger.info(f"After muscle group filtering: {mask.bit_count()} exercises")
+
+        # Filter by allowed equipment if provided
+        if allowed_equipment:
+            filtered = mask & catalog.with_any_equipment(allowed_equipment)
+            if filtered:
+                mask = filtered
+                logger.info(f"After equipment filtering: {mask.bit_count()} exercises")
+
+        # Filter by allowed intensities
+        filtered = mask & catalog.with_intensity(INTENSITY_MAP.get(intensity_level, ["medium"]))
+        if filtered:
+            mask = filtered
+            logger.info(f"After intensity_level filtering: {mask.bit_count()} exercises")
+        catalog.pool_cache.set(key, mask)
+        return mask
+
+    def _candidate_pool(self, allowed_muscle_groups: Optional[list[str]], allowed_equipment: Optional[list[str]],
+                        intensity_level: int) -> Tuple[int, List[ExerciseRecord], List[ExerciseRecord]]:
+        """Apply the filter cascade and return (candidate bitset, candidate exercises, frontal/transverse candidates).
+
+        Pools are cached on the catalog per filter signature, so requests and batches
+        sharing the same filters only filter the catalog once per catalog version.
+        """
+        catalog = self.catalog
+        key = ("pool", filter_signature(allowed_muscle_groups, allowed_equipment, intensity_level))
+        pool = catalog.pool_cache.get(key)
+        if pool is not None:
+            return pool
+
+        with phase("filter"):
+            logger.info(f"Found {len(catalog.all_exercises)} total exercises")
+            logger.info(f"After deduplication: {len(catalog.exercises)} exercises")
+            mask = self._filter_mask(allowed_muscle_groups, allowed_equipment, intensity_level)
 
             # If we have too few exercises after filtering, fall back to less strict filtering
-            if len(exercises) < 3:
+            if mask.bit_count() < 3:
                 logger.info("Too few exercises after strict filtering, falling back to less strict filtering")
-                exercises = original_exercises.copy()
+                mask = catalog.unique_mask
                 # Try filtering by just muscle groups and equipment
                 if allowed_muscle_groups or allowed_equipment:
-                    filtered_exercises = exercises
+                    filtered = mask
                     if allowed_muscle_groups:
-                        allowed_mg_set = set(allowed_muscle_groups)
-                        filtered_exercises = [ex for ex in filtered_exercises if any(mg.name in allowed_mg_set for mg in ex.muscle_groups)]
-                    if allowed_equipment and filtered_exercises:
-                        allowed_equip_set = set(allowed_equipment)
-                        filtered_exercises = [ex for ex in filtered_exercises if any(e.name in allowed_equip_set for e in ex.equipment)]
-                    if filtered_exercises:
-                        exercises = filtered_exercises
-                    logger.info(f"After less strict filtering: {len(exercises)} exercises")
-            if len(exercises) < 3:
+                        filtered &= catalog.with_any_muscle_group(muscle_group_mask(allowed_muscle_groups))
+                    if allowed_equipment and filtered:
+                        filtered &= catalog.with_any_equipment(allowed_equipment)
+                    if filtered:
+                        mask = filtered
+                    logger.info(f"After less strict filtering: {mask.bit_count()} exercises")
+            if mask.bit_count() < 3:
                 logger.info("Still too few exercises, using all exercises")
-                exercises = original_exercises
+                mask = catalog.unique_mask
+
+        # Identify all frontal/transverse exercises
+        with phase("frontal_transverse"):
+            exercises = catalog.exercises_in(mask)
+            frontal_transverse_exercises = catalog.exercises_in(mask & catalog.frontal_transverse_mask)
+        logger.info(f"Found {len(frontal_transverse_exercises)} frontal/transverse exercises")
 
-            # Identify all frontal/transverse exercises
-            frontal_transverse_exercises = [ex for ex in exercises if self.is_frontal_or_transverse(ex)]
-            logger.info(f"Found {len(frontal_transverse_exercises)} frontal/transverse exercises")
+        pool = (mask, exercises, frontal_transverse_exercises)
+        catalog.pool_cache.set(key, pool)
+        return pool
+
+    def generate_workout(self, duration_minutes: int, allowed_muscle_groups: list[str] = None, allowed_equipment: list[str] = None, intensity_level: int = 3, solver: str = "random", seed: Optional[int] = None, selection: str = "random", use_cache: bool = True) -> Dict:
+        """Generate a workout with the specified duration in minutes, optionally filtering by allowed muscle groups, equipment, and intensity level (1-5).
+
+        solver selects how the exercise count and rounds are fitted to the duration (see SOLVERS),
+        and selection how the random solver picks exercises (see SELECTIONS).
+        The same seed and parameters give the same workout for a given catalog version, and
+        seeded results are served from workout_cache unless use_cache is False. Without a seed
+        one is drawn at random and returned, so any workout can be replayed.
+        """
+        try:
+            logger.info(f"Starting workout generation with params: duration={duration_minutes}, muscle_groups={allowed_muscle_groups}, equipment={allowed_equipment}, intensity_level={intensity_level}, solver={solver}, seed={seed}, selection={selection}")
+            if solver not in SOLVERS:
+                raise ValueError(f"Unknown solver '{solver}', expected one of {', '.join(SOLVERS)}")
+            if selection not in SELECTIONS:
+                raise ValueError(f"Unknown selection '{selection}', expected one of {', '.join(SELECTIONS)}")
+
+            cache_key = None
+            if seed is not None and use_cache:
+                cache_key = (
+                    self.catalog.version,
+                    duration_minutes,
+                    tuple(sorted(allowed_muscle_groups)) if allowed_muscle_groups else None,
+                    tuple(sorted(allowed_equipment)) if allowed_equipment else None,
+                    intensity_level,
+                    solver,
+                    selection,
+                    seed
+                )
+                cached = workout_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Serving workout from cache")
+                    return dict(cached, exercises=list(cached["exercises"]))
+            elif seed is None:
+                seed = random.randrange(2 ** 32)
+            rng = random.Random(seed)
+            
+            if not self.catalog.all_exercises:
+                raise ValueError("No exercises available in the database")
+
+            pool_mask, exercises, frontal_transverse_exercises = self._candidate_pool(allowed_muscle_groups, allowed_equipment, intensity_level)
 
             # Determine how many are required
             if duration_minutes <= 20:
@@ -256,57 +544,22 @@ class WorkoutGenerator:
             else:
                 required_count = 2
 
-            min_exercises = 3
-            max_exercises = min(10, len(exercises))
-            min_rounds = 1
-            max_rounds = 4
-
-            best_config = None
-            best_diff = float('inf')
             target_seconds = duration_minutes * 60
-
-            # Try different combinations of exercises and rounds
-            for num_exercises in range(min_exercises, max_exercises + 1):
-                for num_rounds in range(min_rounds, max_rounds + 1):
-                    if num_exercises > len(exercises):
-                        continue
-                    # Select exercises ensuring no similar exercises are adjacent
-                    selected = []
-                    available = exercises.copy()
-                    previous_exercise = None
-                    while len(selected) < num_exercises and available:
-                        candidates = [ex for ex in available if not previous_exercise or not self.are_exercises_similar(ex, previous_exercise)]
-                        if not candidates:
-                            candidates = available
-                        exercise = random.choice(candidates)
-                        selected.append(exercise)
-                        available.remove(exercise)
-                        previous_exercise = exercise
-                    if len(selected) < num_exercises:
-                        continue
-                    # Ensure required number of frontal/transverse exercises
-                    ft_count = sum(1 for ex in selected if self.is_frontal_or_transverse(ex))
-                    if ft_count < required_count and len(frontal_transverse_exercises) >= required_count:
-                        # Replace random exercises with frontal/transverse ones
-                        to_add = required_count - ft_count
-                        # Find which ones are missing
-                        missing = [ex for ex in frontal_transverse_exercises if ex not in selected]
-                        if len(missing) >= to_add:
-                            # Replace random non-frontal/transverse exercises
-                            non_ft_indices = [i for i, ex in enumerate(selected) if not self.is_frontal_or_transverse(ex)]
-                            for i in non_ft_indices[:to_add]:
-                                selected[i] = missing.pop()
-                    # Recount after replacement
-                    ft_count = sum(1 for ex in selected if self.is_frontal_or_transverse(ex))
-                    if ft_count < required_count:
-                        continue  # Skip this config if we can't meet the requirement
-                    total_seconds = self.calculate_workout_duration(selected, num_rounds)
-                    diff = abs(total_seconds - target_seconds)
-                    if diff < best_diff:
-                        best_diff = diff
-                        best_config = (selected, num_rounds, total_seconds)
-                    if diff == 0:
-                        break
+            with phase("search"):
+                if solver == "exact":
+                    # The DP only depends on the pool, so batches and repeated filters share it
+                    tables_key = ("exact", filter_signature(allowed_muscle_groups, allowed_equipment, intensity_level), required_count)
+                    tables = self.catalog.pool_cache.get(tables_key)
+                    if tables is None:
+                        tables = self._exact_sums(exercises, required_count)
+                        self.catalog.pool_cache.set(tables_key, tables)
+                    best_config = self._search_exact_config(exercises, required_count, target_seconds, rng, tables)
+                else:
+                    engine = scoring_engine(self.catalog) if selection == "scored" else None
+                    best_config = self._search_random_config(
+                        pool_mask, frontal_transverse_exercises, required_count, target_seconds, rng,
+                        engine, intensity_target(INTENSITY_MAP.get(intensity_level, ["medium"]))
+                    )
 
             if best_config is None:
                 raise ValueError("Could not generate a workout with the given constraints")
@@ -316,73 +569,183 @@ class WorkoutGenerator:
             
             logger.info(f"Successfully generated workout with {len(workout_exercises)} exercises, {rounds} rounds, {estimated_duration_minutes} minutes")
             
-            return {
+            workout = {
                 "exercises": workout_exercises,
                 "rounds": rounds,
-                "estimated_duration_minutes": estimated_duration_minutes
+                "estimated_duration_minutes": estimated_duration_minutes,
+                "seed": seed
             }
+            if cache_key is not None:
+                workout_cache.set(cache_key, dict(workout, exercises=tuple(workout_exercises)))
+            return workout
+        except ValueError as e:
+            # Constraints that cannot be met are expected (the library build probes every combination)
+            logger.info(f"Could not generate workout: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Error generating workout: {str(e)}")
             raise 
 
-    def swap_exercise(self, current_workout_ids: list[int], swap_out_id: int, allowed_muscle_groups: list[str] = None, allowed_equipment: list[str] = None, intensity_level: int = 3) -> models.Exercise:
-        INTENSITY_MAP = {
-            1: ["low"],
-            2: ["low", "medium"],
-            3: ["medium"],
-            4: ["medium", "high"],
-            5: ["high"]
-        }
-        allowed_intensities = INTENSITY_MAP.get(intensity_level, ["medium"])
-        exercises = self.db.query(models.Exercise).all()
-        # Deduplicate by name
-        unique_exercises = {}
-        for ex in exercises:
-            if ex.name not in unique_exercises:
-                unique_exercises[ex.name] = ex
-        exercises = list(unique_exercises.values())
-        # Filter by muscle groups
-        if allowed_muscle_groups:
-            allowed_mg_set = set(allowed_muscle_groups)
-            def is_allowed_by_mg(ex):
-                ex_mgs = {mg.name for mg in ex.muscle_groups}
-                return ex_mgs.issubset(allowed_mg_set)
-            filtered_exercises = list(filter(is_allowed_by_mg, exercises))
-            if filtered_exercises:
-                exercises = filtered_exercises
-        # Filter by equipment
-        if allowed_equipment:
-            allowed_equip_set = set(allowed_equipment)
-            def is_allowed_by_equip(ex):
-                ex_equip = {e.name for e in ex.equipment}
-                return bool(ex_equip.intersection(allowed_equip_set))
-            filtered_exercises = list(filter(is_allowed_by_equip, exercises))
-            if filtered_exercises:
-                exercises = filtered_exercises
-        # Filter by intensity
-        filtered_exercises = [ex for ex in exercises if (getattr(ex, 'intensity', None) or 'medium') in allowed_intensities]
-        if filtered_exercises:
-            exercises = filtered_exercises
-        # Remove exercises already in the workout
-        exercises = [ex for ex in exercises if ex.id not in current_workout_ids]
+    def generate_workouts(self, param_sets: List[Dict]) -> List[Dict]:
+        """Generate one workout per set of generate_workout keyword arguments, sharing the catalog and filtered pools."""
+        workouts = []
+        for i, params in enumerate(param_sets):
+            try:
+                workouts.append(self.generate_workout(**params))
+            except ValueError as e:
+                raise ValueError(f"Workout {i}: {e}")
+        return workouts
+
+    def swap_exercise(self, current_workout_ids: list[int], swap_out_id: int, allowed_muscle_groups: list[str] = None, allowed_equipment: list[str] = None, intensity_level: int = 3, seed: Optional[int] = None, selection: str = "random") -> ExerciseRecord:
+        """Pick a replacement for swap_out_id that fits the filters and is not similar to its neighbours.
+
+        Passing a seed makes the choice reproducible for a given catalog version. With
+        selection="scored" the replacement is sampled by score against the rest of the
+        workout, aiming at the duration of the exercise it replaces.
+        """
+        if selection not in SELECTIONS:
+            raise ValueError(f"Unknown selection '{selection}', expected one of {', '.join(SELECTIONS)}")
+        rng = random.Random(seed) if seed is not None else random
+        catalog = self.catalog
         # Find the index of the exercise to swap out
         try:
             idx = current_workout_ids.index(swap_out_id)
         except ValueError:
             raise ValueError("Exercise to swap out not found in current workout")
+        # Filter by muscle groups, equipment and intensity (cached per filter signature)
+        exercises = self._filter_mask(allowed_muscle_groups, allowed_equipment, intensity_level)
+        # Remove exercises already in the workout
+        for ex_id in current_workout_ids:
+            ex = catalog.by_id.get(ex_id)
+            if ex is not None:
+                exercises &= ~(1 << ex.index)
         # Get neighbors if any
-        prev_id = current_workout_ids[idx-1] if idx > 0 else None
-        next_id = current_workout_ids[idx+1] if idx < len(current_workout_ids)-1 else None
-        prev_ex = next((ex for ex in self.db.query(models.Exercise).all() if ex.id == prev_id), None)
-        next_ex = next((ex for ex in self.db.query(models.Exercise).all() if ex.id == next_id), None)
+        prev_ex = catalog.by_id.get(current_workout_ids[idx-1]) if idx > 0 else None
+        next_ex = catalog.by_id.get(current_workout_ids[idx+1]) if idx < len(current_workout_ids)-1 else None
         # Prefer exercises that are not similar to neighbors
         candidates = exercises
         if prev_ex:
-            candidates = [ex for ex in candidates if not self.are_exercises_similar(ex, prev_ex)]
+            candidates &= ~catalog.similarity_row(prev_ex)
         if next_ex:
-            candidates = [ex for ex in candidates if not self.are_exercises_similar(ex, next_ex)]
+            candidates &= ~catalog.similarity_row(next_ex)
         if not candidates:
             candidates = exercises  # fallback if too strict
         if not candidates:
             raise ValueError("No suitable replacement exercise found")
-        return random.choice(candidates) 
\ No newline at end of file
+        if selection == "scored":
+            swap_out = catalog.by_id.get(swap_out_id)
+            remaining = [catalog.by_id[ex_id].index for ex_id in current_workout_ids
+                         if ex_id != swap_out_id and ex_id in catalog.by_id]
+            return catalog.all_exercises[scoring_engine(catalog).pick(
+                candidates, remaining, swap_out.estimated_duration if swap_out else None,
+                intensity_target(INTENSITY_MAP.get(intensity_level, ["medium"])), rng
+            )]
+        return catalog.all_exercises[random_bit(candidates, rng)]
+
+    def reroll_workout(self, current_workout_ids: list[int], locked_ids: list[int], allowed_muscle_groups: list[str] = None,
+                       allowed_equipment: list[str] = None, intensity_level: int = 3,
+                       target_duration_minutes: Optional[int] = None, rounds: Optional[int] = None,
+                       seed: Optional[int] = None) -> Dict:
+        """Replace every exercise not in locked_ids in one pass, keeping locked exercises in place.
+
+        Slots are filled left to right, from exercises not already in the workout
+        (the replaced ones are only reused if nothing else fits the filters). Each pick avoids exercises similar to its
+        neighbours, reserves the remaining slots needed for the frontal/transverse
+        quota, and, when a target duration is given, prefers durations that keep the
+        workout on track for it. As with generate_workout, the seed used is returned.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        rng = random.Random(seed)
+        catalog = self.catalog
+        locked = set(locked_ids)
+        missing = locked.difference(current_workout_ids)
+        if missing:
+            raise ValueError(f"Locked exercises not in current workout: {sorted(missing)}")
+        slots: List[Optional[ExerciseRecord]] = []
+        for ex_id in current_workout_ids:
+            if ex_id in locked:
+                if ex_id not in catalog.by_id:
+                    raise ValueError(f"Exercise {ex_id} not found")
+                slots.append(catalog.by_id[ex_id])
+            else:
+                slots.append(None)
+        num_exercises = len(slots)
+        open_slots = [i for i, ex in enumerate(slots) if ex is None]
+
+        pool_mask = self._candidate_pool(allowed_muscle_groups, allowed_equipment, intensity_level)[0]
+        locked_mask = catalog.mask_of(ex for ex in slots if ex is not None)
+        # The exercises being replaced are only reused once nothing else is left
+        replaced_mask = pool_mask & ~locked_mask & catalog.mask_of(
+            catalog.by_id[ex_id] for ex_id in current_workout_ids if ex_id in catalog.by_id
+        )
+        available = pool_mask & ~locked_mask & ~replaced_mask
+
+        # Frontal/transverse quota, as in generate_workout, for the target or current duration
+        if target_duration_minutes is not None:
+            duration_minutes = target_duration_minutes
+        else:
+            current = [catalog.by_id[ex_id] for ex_id in current_workout_ids if ex_id in catalog.by_id]
+            duration_minutes = self.calculate_workout_duration(current, rounds if rounds is not None else 2) / 60
+        required_count = 1 if duration_minutes <= 20 else 2
+        ft_needed = max(0, required_count - sum(1 for ex in slots if ex is not None and ex.is_frontal_or_transverse))
+
+        # Sum of estimated durations to aim for, for the given or best-fitting number of rounds
+        locked_seconds = sum(ex.estimated_duration for ex in slots if ex is not None)
+        target_sum = None
+        if target_duration_minutes is not None and open_slots:
+            pool_durations = [ex.estimated_duration for ex in catalog.exercises_in(available)]
+            typical_sum = locked_seconds + len(open_slots) * (sum(pool_durations) / len(pool_durations) if pool_durations else 0)
+            round_options = [rounds] if rounds is not None else range(MIN_ROUNDS, MAX_ROUNDS + 1)
+            target_sum = min(
+                ((target_duration_minutes * 60 - self.calculate_workout_duration([], r)) / r - REST_BETWEEN_EXERCISES_SECONDS * num_exercises
+                 for r in round_options),
+                key=lambda duration_sum: abs(duration_sum - typical_sum)
+            )
+
+        filled_seconds = locked_seconds
+        for position, i in enumerate(open_slots):
+            if not available:
+                available, replaced_mask = replaced_mask, 0
+            if not available:
+                raise ValueError("No suitable replacement exercise found")
+            previous_ex = slots[i - 1] if i > 0 else None
+            next_ex = slots[i + 1] if i < num_exercises - 1 else None
+            candidates = available
+            # Relax the neighbour constraints one at a time if they leave nothing
+            for neighbours in ((previous_ex, next_ex), (previous_ex,), ()):
+                constrained = available
+                for neighbour in neighbours:
+                    if neighbour is not None:
+                        constrained &= ~catalog.similarity_row(neighbour)
+                if constrained:
+                    candidates = constrained
+                    break
+            # Take a frontal/transverse exercise when every remaining slot is needed for the quota
+            if ft_needed >= len(open_slots) - position and candidates & catalog.frontal_transverse_mask:
+                candidates &= catalog.frontal_transverse_mask
+            if target_sum is None:
+                exercise = catalog.all_exercises[random_bit(candidates, rng)]
+            else:
+                ideal = (target_sum - filled_seconds) / (len(open_slots) - position)
+                options = catalog.exercises_in(candidates)
+                closest = min(abs(ex.estimated_duration - ideal) for ex in options)
+                exercise = rng.choice([ex for ex in options if abs(ex.estimated_duration - ideal) <= closest + 5])
+            slots[i] = exercise
+            available &= ~(1 << exercise.index)
+            filled_seconds += exercise.estimated_duration
+            if exercise.is_frontal_or_transverse:
+                ft_needed = max(0, ft_needed - 1)
+
+        if rounds is None:
+            rounds = 2
+            if target_duration_minutes is not None:
+                rounds = min(range(MIN_ROUNDS, MAX_ROUNDS + 1),
+                             key=lambda r: abs(self.calculate_workout_duration(slots, r) - target_duration_minutes * 60))
+        total_seconds = self.calculate_workout_duration(slots, rounds)
+        return {
+            "exercises": slots,
+            "rounds": rounds,
+            "estimated_duration_minutes": round(total_seconds / 60),
+            "seed": seed
+        }
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+# The app binds its engines at import time, so point it at a throwaway database first
+_database_dir = tempfile.mkdtemp(prefix="workout-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ["WORKOUT_LIBRARY_PATH"] = ""
+# Every write goes through this process, so the stored catalog version never needs re-reading mid-test
+os.environ["CATALOG_VERSION_TTL"] = "3600"
+
+from fastapi.testclient import TestClient
+import pytest
+
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        assert client.post("/seed").status_code == 200
+        yield client
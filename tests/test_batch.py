@@ -0,0 +1,10 @@
+def test_seeded_batch_copies_get_their_own_seeds(client):
+    params = {"duration_minutes": 30, "solver": "exact", "seed": 5}
+    response = client.post("/workouts/generate/batch", json={"params": params, "count": 3})
+    assert response.status_code == 200
+    workouts = response.json()
+
+    assert [workout["seed"] for workout in workouts] == [5, 6, 7]
+    for i, workout in enumerate(workouts):
+        single = client.get("/workouts/generate", params={**params, "seed": 5 + i}).json()
+        assert [exercise["id"] for exercise in workout["exercises"]] == [exercise["id"] for exercise in single["exercises"]]
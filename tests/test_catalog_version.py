@@ -0,0 +1,35 @@
+from app import catalog
+from app.catalog import bump_catalog_version
+from app.database import SessionLocal
+
+
+def test_changes_from_other_processes_are_noticed_after_the_ttl(client, monkeypatch):
+    etag = client.get("/exercises/", params={"limit": 1}).headers["etag"]
+
+    # Another worker or a command-line tool changing the catalog
+    db = SessionLocal()
+    try:
+        version = bump_catalog_version(db)
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/exercises/", params={"limit": 1}).headers["etag"] == etag
+
+    monkeypatch.setattr(catalog, "CATALOG_VERSION_TTL", 0)
+    response = client.get("/exercises/", params={"limit": 1})
+    assert response.headers["etag"] != etag
+    assert catalog.catalog_version() == version
+
+
+def test_api_writes_are_visible_at_once(client):
+    etag = client.get("/exercises/", params={"limit": 1}).headers["etag"]
+    exercise = {
+        "name": "Version Check Plank",
+        "movement_types": ["core"],
+        "estimated_duration": 30,
+        "equipment": [],
+        "muscle_groups": ["abs"],
+        "intensity": "low"
+    }
+    assert client.post("/exercises/", json=exercise).status_code == 200
+    assert client.get("/exercises/", params={"limit": 1}).headers["etag"] != etag
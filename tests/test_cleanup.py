@@ -0,0 +1,59 @@
+from sqlalchemy import func, select
+
+from app import models
+from app.database import SessionLocal
+
+
+def exercise(name):
+    return {
+        "name": name,
+        "movement_types": ["push"],
+        "estimated_duration": 40,
+        "equipment": ["dumbbell"],
+        "muscle_groups": ["chest", "triceps"],
+        "intensity": "medium"
+    }
+
+
+def test_cleanup_keeps_lowest_ids_and_leaves_no_orphans(client):
+    names = ["Cleanup Press", "Cleanup Press", "Cleanup Row", "Cleanup Press", "Cleanup Row"]
+    response = client.post("/exercises/bulk", json=[exercise(name) for name in names])
+    assert response.status_code == 200
+    ids = [created["id"] for created in response.json()]
+
+    dry_run = client.post("/exercises/cleanup", params={"dry_run": True})
+    assert dry_run.status_code == 200
+    assert dry_run.json() == {
+        "dry_run": True,
+        "duplicate_names": ["Cleanup Press", "Cleanup Row"],
+        "equipment_links": 3,
+        "muscle_group_links": 6,
+        "movement_type_links": 3,
+        "exercises": 3
+    }
+
+    response = client.post("/exercises/cleanup")
+    assert response.status_code == 200
+    assert response.json() == ["Cleanup Press", "Cleanup Press", "Cleanup Row"]
+
+    db = SessionLocal()
+    try:
+        remaining = db.execute(
+            select(models.Exercise.id).where(models.Exercise.id.in_(ids)).order_by(models.Exercise.id)
+        ).scalars().all()
+        assert remaining == [ids[0], ids[2]]
+        for table in (models.exercise_equipment, models.exercise_muscle_groups, models.exercise_movement_types):
+            orphans = db.execute(
+                select(func.count()).select_from(table)
+                .where(table.c.exercise_id.not_in(select(models.Exercise.id)))
+            ).scalar()
+            assert orphans == 0, table.name
+        kept_links = db.execute(
+            select(func.count()).select_from(models.exercise_muscle_groups)
+            .where(models.exercise_muscle_groups.c.exercise_id.in_(remaining))
+        ).scalar()
+        assert kept_links == 4
+    finally:
+        db.close()
+
+    assert client.post("/exercises/cleanup", params={"dry_run": True}).json()["exercises"] == 0
@@ -0,0 +1,128 @@
+from collections import namedtuple
+from itertools import combinations, permutations
+import random
+
+import pytest
+
+from app.catalog import ExerciseCatalog
+from app.models import MovementType, MuscleGroupType
+from app.workout_generator import MAX_EXERCISES, MAX_ROUNDS, MIN_EXERCISES, MIN_ROUNDS, WorkoutGenerator
+
+Row = namedtuple("Row", "id name")
+ExerciseRow = namedtuple("ExerciseRow", "id name description estimated_duration intensity")
+
+M = MovementType
+G = MuscleGroupType
+
+# Several exercises share a duration and plane, so the DP groups have more than one member
+VARIED = [
+    ("Push Up", 30, [M.PUSH], [G.CHEST, G.TRICEPS]),
+    ("Dip", 30, [M.PUSH], [G.TRICEPS, G.CHEST]),
+    ("Pull Up", 45, [M.PULL], [G.LATS, G.BICEPS]),
+    ("Row", 45, [M.PULL], [G.UPPER_BACK, G.REAR_DELTOIDS]),
+    ("Squat", 40, [M.SQUAT], [G.QUADS, G.GLUTES]),
+    ("Deadlift", 50, [M.HINGE], [G.HAMSTRINGS, G.LOWER_BACK]),
+    ("Russian Twist", 25, [M.TWIST], [G.OBLIQUES]),
+    ("Woodchop", 25, [M.TWIST], [G.OBLIQUES, G.ABS]),
+    ("Lateral Raise", 35, [M.PUSH], [G.SIDE_DELTOIDS]),
+    ("Plank", 20, [M.CORE], [G.ABS]),
+]
+
+# Every pair shares a movement type, so no order avoids similar neighbours
+ALL_SIMILAR = [
+    ("Push A", 30, [M.PUSH], [G.CHEST]),
+    ("Push B", 35, [M.PUSH], [G.TRICEPS]),
+    ("Push C", 40, [M.PUSH], [G.FRONT_DELTOIDS]),
+    ("Push D", 45, [M.PUSH], [G.SIDE_DELTOIDS]),
+    ("Push E", 50, [M.PUSH], [G.ADDUCTORS]),
+]
+
+
+def make_catalog(specs):
+    muscle_groups = list(G)
+    exercise_rows, muscle_group_links, movement_type_links = [], [], []
+    for exercise_id, (name, duration, movement_types, groups) in enumerate(specs, start=1):
+        exercise_rows.append(ExerciseRow(exercise_id, name, None, duration, "medium"))
+        muscle_group_links += [(exercise_id, muscle_groups.index(group) + 1) for group in groups]
+        movement_type_links += [(exercise_id, movement_type.value) for movement_type in movement_types]
+    rows = (
+        [],
+        [Row(i + 1, group) for i, group in enumerate(muscle_groups)],
+        [],
+        muscle_group_links,
+        movement_type_links,
+        exercise_rows,
+    )
+    return ExerciseCatalog.build(rows)
+
+
+def best_diff(generator, exercises, required_count, target_seconds):
+    """Closest any valid selection of exercises and rounds gets to the target, by brute force."""
+    best = float("inf")
+    for count in range(MIN_EXERCISES, min(MAX_EXERCISES, len(exercises)) + 1):
+        for selection in combinations(exercises, count):
+            if sum(ex.is_frontal_or_transverse for ex in selection) < required_count:
+                continue
+            for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+                best = min(best, abs(generator.calculate_workout_duration(list(selection), rounds) - target_seconds))
+    return best
+
+
+def similar(catalog, left, right):
+    return bool(catalog.similarity_row(left) >> right.index & 1)
+
+
+def has_similar_neighbours(catalog, exercises):
+    return any(similar(catalog, left, right) for left, right in zip(exercises, exercises[1:]))
+
+
+@pytest.mark.parametrize("duration_minutes", [5, 7, 10, 15, 20, 25, 30, 40, 60, 90])
+@pytest.mark.parametrize("seed", range(3))
+def test_exact_solver_matches_brute_force(duration_minutes, seed):
+    catalog = make_catalog(VARIED)
+    generator = WorkoutGenerator(catalog=catalog)
+    required_count = 1 if duration_minutes <= 20 else 2
+    target_seconds = duration_minutes * 60
+
+    selected, rounds, total_seconds = generator._search_exact_config(
+        catalog.exercises, required_count, target_seconds, random.Random(seed)
+    )
+
+    assert len({ex.id for ex in selected}) == len(selected)
+    assert total_seconds == generator.calculate_workout_duration(selected, rounds)
+    assert abs(total_seconds - target_seconds) == best_diff(generator, catalog.exercises, required_count, target_seconds)
+    assert sum(ex.is_frontal_or_transverse for ex in selected) >= required_count
+    if has_similar_neighbours(catalog, selected):
+        assert all(has_similar_neighbours(catalog, list(order)) for order in permutations(selected))
+
+
+def test_exact_solver_reuses_tables_across_targets():
+    catalog = make_catalog(VARIED)
+    generator = WorkoutGenerator(catalog=catalog)
+    tables = generator._exact_sums(catalog.exercises, 2)
+    for duration_minutes in (25, 40, 60):
+        shared = generator._search_exact_config(catalog.exercises, 2, duration_minutes * 60, random.Random(1), tables)
+        fresh = generator._search_exact_config(catalog.exercises, 2, duration_minutes * 60, random.Random(1))
+        assert [ex.id for ex in shared[0]] == [ex.id for ex in fresh[0]]
+        assert shared[1:] == fresh[1:]
+
+
+def test_exact_solver_falls_back_when_no_order_avoids_similar_neighbours():
+    catalog = make_catalog(ALL_SIMILAR)
+    generator = WorkoutGenerator(catalog=catalog)
+    target_seconds = 20 * 60
+
+    selected, rounds, total_seconds = generator._search_exact_config(
+        catalog.exercises, 1, target_seconds, random.Random(0)
+    )
+
+    assert generator.order_exercises(selected) is None
+    assert total_seconds == generator.calculate_workout_duration(selected, rounds)
+    assert abs(total_seconds - target_seconds) == best_diff(generator, catalog.exercises, 1, target_seconds)
+    assert sum(ex.is_frontal_or_transverse for ex in selected) >= 1
+
+
+def test_exact_solver_needs_enough_exercises():
+    catalog = make_catalog(VARIED[:MIN_EXERCISES - 1])
+    generator = WorkoutGenerator(catalog=catalog)
+    assert generator._search_exact_config(catalog.exercises, 1, 20 * 60, random.Random(0)) is None
@@ -0,0 +1,51 @@
+import pytest
+
+from app.catalog import get_catalog
+from app.database import SessionLocal
+
+
+@pytest.fixture(scope="module")
+def catalog(client):
+    db = SessionLocal()
+    try:
+        return get_catalog(db)
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def workout(client):
+    response = client.get("/workouts/generate", params={"duration_minutes": 30, "seed": 11})
+    assert response.status_code == 200
+    return [exercise["id"] for exercise in response.json()["exercises"]]
+
+
+def reroll(client, workout, locked, **params):
+    response = client.post("/workouts/reroll", json={"current_workout_ids": workout, "locked_ids": locked, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_reroll_keeps_locked_and_replaces_the_rest(client, catalog, workout, seed):
+    locked = [workout[1]]
+    result = reroll(client, workout, locked, seed=seed)
+    ids = [exercise["id"] for exercise in result["exercises"]]
+
+    assert len(ids) == len(workout)
+    assert ids[1] == workout[1]
+    replaced = set(workout) - set(locked)
+    assert not replaced & set(ids)
+
+    records = [catalog.by_id[exercise_id] for exercise_id in ids]
+    for left, right in zip(records, records[1:]):
+        assert not catalog.similarity_row(left) >> right.index & 1, (left.name, right.name)
+
+    frontal_or_transverse = sum(1 for exercise in records if exercise.is_frontal_or_transverse)
+    assert frontal_or_transverse >= (1 if result["estimated_duration_minutes"] <= 20 else 2)
+
+
+@pytest.mark.parametrize("rounds", [0, -1, 5])
+def test_reroll_rejects_out_of_range_rounds(client, workout, rounds):
+    response = client.post("/workouts/reroll", json={"current_workout_ids": workout, "rounds": rounds})
+    assert response.status_code == 422
@@ -0,0 +1,65 @@
+from contextlib import ExitStack
+
+import pytest
+
+from app.database import count_statements, engine, get_async_engine
+from app.main import catalog_responses, exercise_fragments
+
+
+def count_all_statements():
+    """Count statements on both the sync and the async engine."""
+    stack = ExitStack()
+    counters = [stack.enter_context(count_statements(bind)) for bind in (engine, get_async_engine().sync_engine)]
+    return stack, counters
+
+
+def test_warm_generate_runs_no_statements(client):
+    params = {"duration_minutes": 30, "seed": 7}
+    assert client.get("/workouts/generate", params=params).status_code == 200
+
+    stack, counters = count_all_statements()
+    with stack:
+        for seed in range(5):
+            response = client.get("/workouts/generate", params={"duration_minutes": 30, "seed": seed + 100})
+            assert response.status_code == 200
+    assert sum(counter[0] for counter in counters) == 0
+
+
+def listing_statements(client, limit, warm):
+    """Statements run by one /exercises/ page, with or without cached exercise fragments."""
+    catalog_responses.clear()
+    if not warm:
+        exercise_fragments.clear()
+    stack, counters = count_all_statements()
+    with stack:
+        response = client.get("/exercises/", params={"limit": limit})
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+    return sum(counter[0] for counter in counters)
+
+
+@pytest.fixture(scope="module")
+def large_catalog(client):
+    """Top the seeded catalog up so a page of 50 is full."""
+    filler = [
+        {
+            "name": f"Filler {i}",
+            "movement_types": ["push"],
+            "estimated_duration": 30,
+            "equipment": ["dumbbell"],
+            "muscle_groups": ["chest", "triceps"],
+            "intensity": "medium"
+        }
+        for i in range(60)
+    ]
+    assert client.post("/exercises/bulk", json=filler).status_code == 200
+    return client
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_listing_statements_do_not_grow_with_page_size(large_catalog, warm):
+    client = large_catalog
+    if warm:
+        client.get("/exercises/", params={"limit": 50})
+    counts = {limit: listing_statements(client, limit, warm) for limit in (5, 20, 50)}
+    assert len(set(counts.values())) == 1, counts
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+def test_superset_honours_size(client, size):
+    response = client.get("/workouts/superset", params={"size": size, "seed": 3})
+    assert response.status_code == 200
+    assert len(response.json()) == size